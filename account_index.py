@@ -0,0 +1,162 @@
+import os
+import hashlib
+from datetime import datetime, timedelta, timezone
+import logging
+
+from gwt import extract_uid_password
+from rolling_refresh import decode_token_exp
+from runtime_config import runtime_config
+
+logger = logging.getLogger(__name__)
+
+# Tokens without a readable `exp` are served from the index for this long after their fetch
+DEFAULT_REFRESH_WINDOW_MINUTES = int(os.getenv("UID_REFRESH_WINDOW_MINUTES", "60"))
+
+class AccountIndex:
+    """Global UID index across all configured account files.
+
+    The single parser of account files. With an AccountStore attached, the
+    parsed accounts and fetch results are persisted there, and stored tokens
+    seed the index after a restart.
+    """
+
+    def __init__(self, account_files, refresh_window_minutes=DEFAULT_REFRESH_WINDOW_MINUTES, store=None):
+        self.account_files = list(account_files)
+        self.refresh_window = timedelta(minutes=refresh_window_minutes)
+        self.store = store
+
+        self._files = {}      # path -> {"mtime", "hash", "pairs"}
+        self.owners = {}      # uid -> owning file (first configured file wins)
+        self.passwords = {}   # uid -> password
+        self.duplicates = {}  # uid -> files it appears in (repeated per copy)
+        self._fetched = {}    # uid -> (fetched_at, token)
+
+        if store:
+            for uid, (success_at, token) in store.load_fetches().items():
+                self._fetched[uid] = (datetime.fromtimestamp(success_at, timezone.utc), token)
+
+    def _load_file(self, path):
+        """Load a file if its mtime or content hash changed. Returns True on change."""
+        if not os.path.exists(path):
+            if path in self._files:
+                del self._files[path]
+                return True
+            return False
+
+        mtime = os.path.getmtime(path)
+        entry = self._files.get(path)
+        if entry and entry["mtime"] == mtime:
+            return False
+
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except OSError as e:
+            # Keep the last good copy rather than failing the cycle
+            logger.error(f"Error reading account file {path}: {e}")
+            return False
+        digest = hashlib.sha256(raw).hexdigest()
+
+        if entry and entry["hash"] == digest:
+            entry["mtime"] = mtime
+            return False
+
+        pairs = extract_uid_password(raw.decode("utf-8", errors="replace"))
+        self._files[path] = {"mtime": mtime, "hash": digest, "pairs": pairs}
+        logger.info(f"📇 Indexed {len(pairs)} accounts from {path}")
+        return True
+
+    def refresh(self):
+        """Reload changed account files and rebuild the global UID index"""
+        changed = [path for path in self.account_files if self._load_file(path)]
+        if not changed:
+            return False
+
+        owners = {}
+        passwords = {}
+        seen_in = {}
+        for path in self.account_files:
+            entry = self._files.get(path)
+            if not entry:
+                continue
+            for uid, password in entry["pairs"]:
+                seen_in.setdefault(uid, []).append(path)
+                if uid not in owners:
+                    owners[uid] = path
+                    passwords[uid] = password
+
+        self.owners = owners
+        self.passwords = passwords
+        self.duplicates = {uid: files for uid, files in seen_in.items() if len(files) > 1}
+
+        if self.store:
+            self.store.sync({path: self._files[path]["pairs"] for path in self.account_files if path in self._files})
+
+        for path in changed:
+            self._report_duplicates(path)
+        return True
+
+    def _report_duplicates(self, path):
+        """Log duplicate UIDs affecting a freshly loaded file"""
+        within = 0
+        across = 0
+        for uid, files in self.duplicates.items():
+            count = files.count(path)
+            if count > 1:
+                within += count - 1
+            if count and len(set(files)) > 1:
+                across += 1
+
+        if within or across:
+            logger.warning(
+                f"⚠️ {path}: {within} duplicate UID entries within file, "
+                f"{across} UIDs also present in other account files"
+            )
+
+    def file_uids(self, path):
+        """Unique UIDs of a file in file order"""
+        entry = self._files.get(path)
+        if not entry:
+            return []
+        return list(dict.fromkeys(uid for uid, _ in entry["pairs"]))
+
+    def is_reusable(self, uid, now):
+        """A stored token is reused while it stays valid past the next cycle (one interval away)"""
+        fetched = self._fetched.get(uid)
+        if not fetched:
+            return False
+        exp = decode_token_exp(fetched[1])
+        if exp is None:
+            return now - fetched[0] < self.refresh_window
+        return exp - now.timestamp() >= runtime_config.get("interval_hours") * 3600
+
+    def select_for_fetch(self, path, now=None):
+        """Split a file's UIDs into pairs to fetch and tokens still valid in the index.
+
+        UIDs shared with other files (owned by the first file listing them)
+        are fetched by whichever file's turn comes once their token would
+        expire before the next cycle, and reused on every other rotation.
+        """
+        now = now or datetime.now(timezone.utc)
+        to_fetch = []
+        cached = {}
+        shared_reused = 0
+
+        for uid in self.file_uids(path):
+            if self.is_reusable(uid, now):
+                cached[uid] = self._fetched[uid][1]
+                shared_reused += self.owners.get(uid) != path
+            else:
+                to_fetch.append((uid, self.passwords[uid]))
+
+        if shared_reused:
+            logger.info(f"📇 {path}: reusing {shared_reused} tokens of UIDs owned by other files")
+        return to_fetch, cached
+
+    def record_fetch(self, tokens_by_uid, failed_uids=(), now=None):
+        """Remember freshly fetched tokens (and persist outcomes when a store is attached)"""
+        now = now or datetime.now(timezone.utc)
+        for uid, token in tokens_by_uid.items():
+            self._fetched[uid] = (now, token)
+        if self.store:
+            self.store.record_results(tokens_by_uid, failed_uids)
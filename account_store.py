@@ -0,0 +1,98 @@
+import os
+import time
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_STORE_DB = os.getenv("ACCOUNT_STORE_DB", "accounts.db")
+
+class AccountStore:
+    """Indexed SQLite store of accounts keyed by UID, with per-account fetch metadata"""
+
+    def __init__(self, db_path=ACCOUNT_STORE_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS accounts (
+                uid TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                source_file TEXT NOT NULL,
+                last_fetch_at REAL,
+                last_success_at REAL,
+                last_token TEXT,
+                consecutive_failures INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_accounts_source ON accounts (source_file, last_success_at);
+            CREATE INDEX IF NOT EXISTS idx_accounts_success ON accounts (last_success_at);
+            CREATE TABLE IF NOT EXISTS account_sources (
+                uid TEXT NOT NULL,
+                path TEXT NOT NULL,
+                PRIMARY KEY (uid, path)
+            );
+            CREATE INDEX IF NOT EXISTS idx_account_sources_path ON account_sources (path);
+        """)
+
+    def sync(self, files):
+        """Mirror the parsed account files ({path: [(uid, password), ...]} in configured order).
+
+        Parsing and change detection stay with AccountIndex; the store only
+        persists accounts and their fetch metadata. `source_file` is the
+        owning (first) file, every file listing a UID is kept in
+        account_sources, and a UID is dropped only when no file lists it.
+        Returns (accounts, removed).
+        """
+        accounts = {}
+        memberships = set()
+        for path, pairs in files.items():
+            for uid, password in pairs:
+                accounts.setdefault(uid, (password, path))
+                memberships.add((uid, path))
+
+        with self._lock, self._conn:
+            # Fetch metadata survives re-syncs; only password and owner are refreshed
+            self._conn.executemany(
+                "INSERT INTO accounts (uid, password, source_file) VALUES (?, ?, ?) "
+                "ON CONFLICT(uid) DO UPDATE SET password = excluded.password, source_file = excluded.source_file",
+                [(uid, password, path) for uid, (password, path) in accounts.items()]
+            )
+
+            existing = {uid for (uid,) in self._conn.execute("SELECT uid FROM accounts")}
+            removed = existing - accounts.keys()
+            self._conn.executemany("DELETE FROM accounts WHERE uid = ?", [(uid,) for uid in removed])
+
+            self._conn.execute("DELETE FROM account_sources")
+            self._conn.executemany("INSERT INTO account_sources (uid, path) VALUES (?, ?)", sorted(memberships))
+
+        if removed:
+            logger.info(f"🗃️ Account store: {len(accounts)} accounts, {len(removed)} no longer listed in any file")
+        return len(accounts), len(removed)
+
+    def load_fetches(self):
+        """{uid: (last_success_at, last_token)} for accounts with a stored token"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT uid, last_success_at, last_token FROM accounts WHERE last_token IS NOT NULL"
+            ).fetchall()
+        return {uid: (success_at, token) for uid, success_at, token in rows}
+
+    def record_results(self, tokens_by_uid, failed_uids):
+        """Store fetch outcomes"""
+        if not tokens_by_uid and not failed_uids:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE accounts SET last_fetch_at = ?, last_success_at = ?, last_token = ?, consecutive_failures = 0 WHERE uid = ?",
+                [(now, now, token, uid) for uid, token in tokens_by_uid.items()]
+            )
+            self._conn.executemany(
+                "UPDATE accounts SET last_fetch_at = ?, consecutive_failures = consecutive_failures + 1 WHERE uid = ?",
+                [(now, uid) for uid in failed_uids]
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import concurrent.futures
+from contextlib import contextmanager
+import logging
+
+from cycle_profiler import active_profiler
+
+logger = logging.getLogger(__name__)
+
+# Threads running cycle work (fetch, artifact writes, publishing, backups)
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))
+# Nice value added to background threads (Linux; 0 disables)
+BACKGROUND_NICE = int(os.getenv("BACKGROUND_NICE", "10"))
+# CPU-heavy steps (JSON encoding, hashing, console rendering) allowed to run at once
+CPU_HEAVY_LIMIT = int(os.getenv("CPU_HEAVY_LIMIT", "1"))
+
+_cpu_slots = threading.BoundedSemaphore(CPU_HEAVY_LIMIT)
+_background = threading.local()
+
+def _lower_thread_priority():
+    """Executor initializer: mark the thread as background and renice it.
+
+    On Linux, PRIO_PROCESS with a thread id renices only that thread, and
+    threads it starts (e.g. gwt's request pool) inherit the nice value.
+    """
+    _background.active = True
+    if BACKGROUND_NICE <= 0 or not sys.platform.startswith("linux"):
+        return
+    try:
+        tid = threading.get_native_id()
+        os.setpriority(os.PRIO_PROCESS, tid, os.getpriority(os.PRIO_PROCESS, tid) + BACKGROUND_NICE)
+    except (AttributeError, OSError) as e:
+        logger.debug(f"Could not lower background thread priority: {e}")
+
+def in_background():
+    return getattr(_background, "active", False)
+
+@contextmanager
+def cpu_slot():
+    """Limit concurrent CPU-heavy steps; the event loop thread never waits for a slot"""
+    if not in_background():
+        yield
+        return
+    with _cpu_slots:
+        yield
+    yield_point()
+
+def yield_point():
+    """Cooperative yield: give the GIL to the event loop thread between units of background work"""
+    if in_background():
+        time.sleep(0)
+
+class BackgroundExecutor:
+    """Bounded, lower-priority executor for cycle work, kept apart from the event loop"""
+
+    def __init__(self, max_workers=BACKGROUND_WORKERS):
+        self.max_workers = max_workers
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="background",
+            initializer=_lower_thread_priority
+        )
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking call in the background pool (profiled while a cycle profile is active)"""
+        loop = asyncio.get_running_loop()
+        call = lambda: func(*args, **kwargs)
+        profiler = active_profiler()
+        if profiler:
+            call = profiler.wrap(call)
+        return await loop.run_in_executor(self.executor, call)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,151 @@
+import os
+import gzip
+import json
+import hashlib
+from datetime import datetime, timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+
+# Retention policy
+BACKUP_KEEP_LAST = int(os.getenv("BACKUP_KEEP_LAST", "10"))
+BACKUP_KEEP_DAILY = int(os.getenv("BACKUP_KEEP_DAILY", "7"))
+BACKUP_KEEP_WEEKLY = int(os.getenv("BACKUP_KEEP_WEEKLY", "4"))
+
+class BackupStore:
+    """Content-addressed, gzip-compressed snapshot store with retention.
+
+    Each snapshot is an entry in manifest.json pointing at an object named by
+    the SHA-256 of the uncompressed content, so identical snapshots share one
+    object on disk.
+    """
+
+    def __init__(self, directory=BACKUP_DIR, keep_last=BACKUP_KEEP_LAST,
+                 keep_daily=BACKUP_KEEP_DAILY, keep_weekly=BACKUP_KEEP_WEEKLY):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, f"{digest}.json.gz")
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, snapshots):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshots, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def snapshot(self, source_path="token_ind.json", label=None):
+        """Store a snapshot of `source_path`; returns (snapshot, is_new_object)"""
+        with open(source_path, "rb") as f:
+            content = f.read()
+
+        digest = hashlib.sha256(content).hexdigest()
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        object_path = self._object_path(digest)
+        is_new_object = not os.path.exists(object_path)
+        if is_new_object:
+            tmp_path = f"{object_path}.tmp"
+            with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+                f.write(content)
+            os.replace(tmp_path, object_path)
+
+        snapshots = self._load_manifest()
+        now = datetime.now(timezone.utc)
+        snapshot = {
+            "id": f"{now.strftime('%Y%m%d_%H%M%S')}_{digest[:8]}",
+            "created_at": now.isoformat(),
+            "sha256": digest,
+            "size": len(content),
+            "label": label,
+        }
+
+        # Consecutive identical snapshots only refresh the latest entry
+        if snapshots and snapshots[-1]["sha256"] == digest:
+            snapshots[-1]["created_at"] = snapshot["created_at"]
+            snapshot = snapshots[-1]
+        else:
+            snapshots.append(snapshot)
+
+        self._save_manifest(self.apply_retention(snapshots))
+        return snapshot, is_new_object
+
+    def apply_retention(self, snapshots):
+        """Keep the last N plus the newest snapshot of each recent day and ISO week"""
+        ordered = sorted(snapshots, key=lambda s: s["created_at"], reverse=True)
+        keep_ids = {s["id"] for s in ordered[:self.keep_last]}
+
+        days = {}
+        weeks = {}
+        for snap in ordered:
+            created = datetime.fromisoformat(snap["created_at"])
+            day = created.date()
+            week = created.isocalendar()[:2]
+            if day not in days and len(days) < self.keep_daily:
+                days[day] = snap["id"]
+            if week not in weeks and len(weeks) < self.keep_weekly:
+                weeks[week] = snap["id"]
+
+        keep_ids.update(days.values())
+        keep_ids.update(weeks.values())
+        kept = [s for s in snapshots if s["id"] in keep_ids]
+
+        # Drop objects no snapshot points at any more
+        referenced = {s["sha256"] for s in kept}
+        if os.path.isdir(self.objects_dir):
+            for name in os.listdir(self.objects_dir):
+                digest = name.split(".", 1)[0]
+                if name.endswith(".json.gz") and digest not in referenced:
+                    os.remove(os.path.join(self.objects_dir, name))
+
+        return kept
+
+    def list_snapshots(self):
+        """Snapshots, newest first"""
+        return sorted(self._load_manifest(), key=lambda s: s["created_at"], reverse=True)
+
+    def find(self, snapshot_id=None):
+        """Find a snapshot by id (or unique id prefix); latest when no id given"""
+        snapshots = self.list_snapshots()
+        if not snapshots:
+            return None
+        if not snapshot_id or snapshot_id == "latest":
+            return snapshots[0]
+
+        matches = [s for s in snapshots if s["id"].startswith(snapshot_id)]
+        return matches[0] if len(matches) == 1 else None
+
+    def restore(self, snapshot_id=None, target_path="token_ind.json"):
+        """Restore a snapshot over `target_path`"""
+        snapshot = self.find(snapshot_id)
+        if not snapshot:
+            raise Exception(f"Backup snapshot not found: {snapshot_id or 'latest'}")
+
+        with gzip.open(self._object_path(snapshot["sha256"]), "rb") as f:
+            content = f.read()
+        if hashlib.sha256(content).hexdigest() != snapshot["sha256"]:
+            raise Exception(f"Backup snapshot {snapshot['id']} is corrupted")
+
+        tmp_path = f"{target_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, target_path)
+        return snapshot
+
+    def disk_usage(self):
+        """Bytes used by stored objects"""
+        if not os.path.isdir(self.objects_dir):
+            return 0
+        return sum(os.path.getsize(os.path.join(self.objects_dir, name)) for name in os.listdir(self.objects_dir))
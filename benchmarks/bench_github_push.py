@@ -0,0 +1,252 @@
+"""Push multi-megabyte token artifacts to a local mock of the GitHub API.
+
+The mock implements the Contents API (with GitHub's behaviour of leaving
+`content` out for files over 1MB) and the Git Data API used for large files
+(blobs, trees, commits, refs). For each artifact size the bot's push_to_github
+runs twice, for the token_ind.json list format and the UID-keyed index
+(token_ind_by_uid.json, a JSON object), and the benchmark checks that:
+
+  * the file stored by the mock is byte-identical to the local artifact
+  * the second push is detected as unchanged by blob SHA
+
+and reports which API path was used, push time and Python heap peak (tracemalloc).
+
+Usage:  python benchmarks/bench_github_push.py [--sizes 0.5,2,8,32]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+import tempfile
+import argparse
+import socket
+import threading
+import subprocess
+import tracemalloc
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPO = "bench/tokens"
+BRANCH = "main"
+CONTENT_LIMIT = 1024 * 1024
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def blob_sha(data):
+    return hashlib.sha1(f"blob {len(data)}\0".encode() + data).hexdigest()
+
+class MockGitHub:
+    """Single-branch repository state: blobs, trees ({path: blob sha}) and commits"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.blobs = {}
+        self.trees = {"tree0": {}}
+        self.commits = {"commit0": {"tree": "tree0", "parents": []}}
+        self.head = "commit0"
+        self.calls = {}
+
+    def files(self):
+        return self.trees[self.commits[self.head]["tree"]]
+
+    def commit(self, tree, message):
+        sha = hashlib.sha1(f"{tree}{self.head}{message}{time.time()}".encode()).hexdigest()
+        self.commits[sha] = {"tree": tree, "parents": [self.head]}
+        return sha
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mock = None
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+            raw = b"".join(parts)
+        else:
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        return json.loads(raw) if raw else {}
+
+    def _send(self, status, payload=None):
+        body = json.dumps(payload or {}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method):
+        mock = self.mock
+        path = self.path.split("?")[0]
+        prefix = f"/repos/{REPO}"
+        key = f"{method} {path.replace(prefix, '').split('/')[1] if path != prefix else 'repo'}"
+        mock.calls[key] = mock.calls.get(key, 0) + 1
+
+        if path == prefix:
+            return self._send(200, {"full_name": REPO, "size": 0})
+        if path == "/_mock/state":
+            with mock.lock:
+                return self._send(200, {"files": mock.files(), "calls": mock.calls})
+        if path == "/_mock/reset":
+            mock.calls.clear()
+            return self._send(200)
+
+        with mock.lock:
+            if path.startswith(f"{prefix}/contents/"):
+                name = path[len(f"{prefix}/contents/"):]
+                if method == "GET":
+                    sha = mock.files().get(name)
+                    if not sha:
+                        return self._send(404, {"message": "Not Found"})
+                    data = mock.blobs[sha]
+                    content = base64.b64encode(data).decode() if len(data) <= CONTENT_LIMIT else ""
+                    return self._send(200, {"sha": sha, "size": len(data), "content": content})
+                # PUT
+                body = self._body()
+                if len(body["content"]) * 3 // 4 > CONTENT_LIMIT:
+                    return self._send(422, {"message": "File too large for the Contents API"})
+                if mock.files().get(name) != body.get("sha"):
+                    return self._send(409, {"message": "sha mismatch"})
+                data = base64.b64decode(body["content"])
+                sha = blob_sha(data)
+                mock.blobs[sha] = data
+                tree = f"tree{len(mock.trees)}"
+                mock.trees[tree] = {**mock.files(), name: sha}
+                mock.head = mock.commit(tree, body["message"])
+                return self._send(201, {"commit": {"sha": mock.head}})
+
+            if path == f"{prefix}/git/blobs":
+                body = self._body()
+                data = base64.b64decode(body["content"])
+                sha = blob_sha(data)
+                mock.blobs[sha] = data
+                return self._send(201, {"sha": sha})
+            if path == f"{prefix}/git/ref/heads/{BRANCH}":
+                return self._send(200, {"object": {"sha": mock.head}})
+            if path.startswith(f"{prefix}/git/commits/") and method == "GET":
+                sha = path.rsplit("/", 1)[1]
+                return self._send(200, {"sha": sha, "tree": {"sha": mock.commits[sha]["tree"]}})
+            if path == f"{prefix}/git/trees":
+                body = self._body()
+                tree = f"tree{len(mock.trees)}"
+                mock.trees[tree] = {**mock.trees[body["base_tree"]], **{e["path"]: e["sha"] for e in body["tree"]}}
+                return self._send(201, {"sha": tree})
+            if path == f"{prefix}/git/commits":
+                body = self._body()
+                if body["parents"] != [mock.head]:
+                    return self._send(422, {"message": "stale parent"})
+                sha = mock.commit(body["tree"], body["message"])
+                return self._send(201, {"sha": sha})
+            if path == f"{prefix}/git/refs/heads/{BRANCH}":
+                body = self._body()
+                if mock.commits.get(body["sha"], {}).get("parents") != [mock.head]:
+                    return self._send(422, {"message": "Update is not a fast forward"})
+                mock.head = body["sha"]
+                return self._send(200, {"object": {"sha": mock.head}})
+
+        return self._send(404, {"message": "Not Found"})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+def write_artifact(path, size_mb, keyed=False):
+    """Artifact of roughly `size_mb` megabytes: token_ind.json list, or {uid: token} when keyed"""
+    token = "eyJhbGciOiJIUzI1NiJ9." + "x" * 300 + ".bench"
+    count = max(1, int(size_mb * 1024 * 1024 / (len(token) + 24)))
+    with open(path, "w", encoding="utf-8") as f:
+        if keyed:
+            json.dump({str(4000000000 + i): f"{token}{i}" for i in range(count)}, f, indent=2, sort_keys=True)
+        else:
+            json.dump([{"token": f"{token}{i}"} for i in range(count)], f, indent=4)
+    return count
+
+def serve(port):
+    MockHandler.mock = MockGitHub()
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+    print(f"mock GitHub listening on {port}", flush=True)
+    server.serve_forever()
+
+def mock_call(api_url, path):
+    with urllib.request.urlopen(f"{api_url}{path}", timeout=30) as response:
+        return json.loads(response.read())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="0.5,2,8,32", help="artifact sizes in MB")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args.serve)
+
+    os.chdir(tempfile.mkdtemp(prefix="bench_github_push_"))
+    # Mock runs in a subprocess so the heap peak only covers the push itself
+    port = free_port()
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", str(port)], stdout=subprocess.PIPE)
+    server.stdout.readline()
+    api_url = f"http://127.0.0.1:{port}"
+
+    os.environ["GITHUB_API_URL"] = api_url
+    os.environ["BRANCH"] = BRANCH
+    import github_update
+
+    github_update.set_github_credentials("ghp_bench", REPO)
+
+    print(f"{'format':<8}{'size MB':>8}{'tokens':>9}{'path':>10}{'push s':>9}{'heap peak MB':>14}"
+          f"{'verified':>10}{'2nd push':>12}")
+    try:
+        for keyed, size in ((keyed, size) for keyed in (False, True) for size in args.sizes.split(",")):
+            size_mb = float(size)
+            path = f"token_ind{'_by_uid' if keyed else ''}_{size_mb}.json"
+            repo_path = "token_ind_by_uid.json" if keyed else "token_ind.json"
+            count = write_artifact(path, size_mb, keyed)
+            with open(path, "rb") as f:
+                local_sha = blob_sha(f.read())
+            mock_call(api_url, "/_mock/reset")
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            github_update.push_to_github(path, repo_path)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # The mock hashes the bytes it decoded, so equal SHAs mean an identical file
+            state = mock_call(api_url, "/_mock/state")
+            verified = state["files"].get(repo_path) == local_sha
+            api_path = "blobs" if state["calls"].get("POST git") else "contents"
+            second = github_update.push_to_github(path, repo_path)
+            unchanged = "unchanged" if second.startswith("⚡") else "PUSHED"
+
+            print(f"{'dict' if keyed else 'list':<8}{os.path.getsize(path) / 1024 / 1024:>8.1f}{count:>9}{api_path:>10}{elapsed:>9.2f}"
+                  f"{peak / 1024 / 1024:>14.1f}{'yes' if verified else 'NO':>10}{unchanged:>12}")
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""Load-test the Telegram handlers with and without a token cycle running.
+
+Starts benchmarks/fake_bot_api.py in a subprocess (Bot API plus a fake upstream
+token API), registers the bot's handlers on a real, started Application pointed
+at it and puts bursts of synthetic updates on application.update_queue, so they
+go through PTB's own update processing (one update at a time, as in production):
+
+  * /start and /status commands        (start_command, status_command)
+  * "status" / "show_config" buttons   (button_callback)
+  * a setup reply                      (handle_setup_message)
+
+Each scenario is run idle and again while a cycle runs. The cycle is started
+the way a user starts it, by sending /run through the same queue (and sent
+again whenever the previous one finished); it works through synthetic account
+files against the fake upstream, and publishing goes to the fake API. Reported
+per scenario: latency p50/p99 (update queued -> its handlers done, replies
+included), throughput and event-loop lag (overshoot of a 10 ms ticker).
+
+Usage:  python benchmarks/bench_handlers.py [--bursts 20] [--burst-size 25] [--accounts 200]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import argparse
+import statistics
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import free_port, start_fake_api
+
+CHAT_ID = 1000
+LAG_TICK = 0.01
+
+_ids = itertools.count(1)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def message_update(text, command=False):
+    message = {
+        "message_id": next(_ids),
+        "date": int(time.time()),
+        "chat": {"id": CHAT_ID, "type": "private"},
+        "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Bench"},
+        "text": text,
+    }
+    if command:
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": next(_ids), "message": message}
+
+def callback_update(data):
+    return {
+        "update_id": next(_ids),
+        "callback_query": {
+            "id": str(next(_ids)),
+            "chat_instance": "bench",
+            "data": data,
+            "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Bench"},
+            "message": {
+                "message_id": next(_ids),
+                "date": int(time.time()),
+                "chat": {"id": CHAT_ID, "type": "private"},
+                "text": "menu",
+            },
+        },
+    }
+
+SCENARIOS = {
+    "start_command": lambda: message_update("/start", command=True),
+    "status_command": lambda: message_update("/status", command=True),
+    "button_callback": lambda: callback_update("show_config"),
+    "handle_setup_message": lambda: message_update("not-a-repo"),
+}
+
+class LoopLagMonitor:
+    """Measures how late a fixed-interval ticker wakes up"""
+
+    def __init__(self, interval=LAG_TICK):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return self.samples
+
+class UpdateTimer:
+    """Completion times of queued updates, from a catch-all handler in the last group"""
+
+    def __init__(self, application):
+        from telegram import Update
+        from telegram.ext import TypeHandler
+
+        self.waiters = {}
+        application.add_handler(TypeHandler(Update, self._done), group=99)
+
+    async def _done(self, update, context):
+        waiter = self.waiters.pop(update.update_id, None)
+        if waiter and not waiter.done():
+            waiter.set_result(time.perf_counter())
+
+_timer = None
+
+async def start_processing(bot):
+    """Start the Application's update processor (no polling: updates are queued directly)"""
+    global _timer
+    _timer = UpdateTimer(bot.application)
+    await bot.application.start()
+
+async def queue_update(bot, payload):
+    """Queue an update like the updater does; returns a future resolved when it was handled"""
+    from telegram import Update
+
+    update = Update.de_json(payload, bot.application.bot)
+    done = asyncio.get_running_loop().create_future()
+    _timer.waiters[update.update_id] = done
+    await bot.application.update_queue.put(update)
+    return done
+
+async def timed_update(bot, payload):
+    start = time.perf_counter()
+    finished_at = await (await queue_update(bot, payload))
+    return finished_at - start
+
+async def run_scenario(bot, make_update, bursts, burst_size):
+    latencies = []
+    monitor = LoopLagMonitor()
+    monitor.start()
+    start = time.perf_counter()
+
+    for _ in range(bursts):
+        latencies.extend(await asyncio.gather(*(timed_update(bot, make_update()) for _ in range(burst_size))))
+
+    elapsed = time.perf_counter() - start
+    lag = await monitor.stop() or [0.0]
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "throughput": len(latencies) / elapsed,
+        "lag_p99_ms": percentile(lag, 0.99) * 1000,
+        "lag_max_ms": max(lag) * 1000,
+    }
+
+def write_account_file(path, count):
+    with open(path, "w") as f:
+        json.dump([{"uid": str(4000000000 + i), "password": f"bench{i}"} for i in range(count)], f)
+
+def configure_for_cycles(bot, accounts):
+    """Account files and fake GitHub credentials so /run runs a full cycle"""
+    for path in bot.account_files:
+        write_account_file(path, accounts)
+    bot.github_token = "ghp_bench"
+    bot.repo_name = "bench/tokens"
+
+async def run_loop(bot, stop):
+    """Keep a cycle running for the whole measurement window by sending /run"""
+    cycles = 0
+    while not stop.is_set():
+        if not bot.cycle_queue.running:
+            await queue_update(bot, message_update("/run", command=True))
+            cycles += 1
+        await asyncio.sleep(0.05)
+    # Let the last cycle finish before the next condition
+    while bot.cycle_queue.running:
+        await asyncio.sleep(0.1)
+    return cycles
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--burst-size", type=int, default=25)
+    parser.add_argument("--accounts", type=int, default=200, help="accounts per account file")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="fake token API delay (s)")
+    args = parser.parse_args()
+
+    # Run from a scratch directory so local config and artifacts are not touched
+    os.chdir(tempfile.mkdtemp(prefix="bench_handlers_"))
+    os.environ["TELEGRAM_BOT_TOKEN"] = "123456:bench"
+    os.environ.pop("ADMIN_CHAT_ID", None)
+    os.environ.pop("WEBHOOK_URL", None)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["BACKUP_ENABLED"] = "false"
+
+    api_port = free_port()
+    api_url = f"http://127.0.0.1:{api_port}"
+    fake_api = start_fake_api(api_port, upstream_latency=args.upstream_latency)
+    os.environ["TELEGRAM_API_BASE_URL"] = api_url
+
+    # Publishing fails fast against the fake API instead of reaching GitHub
+    os.environ["GITHUB_API_URL"] = api_url
+
+    import gwt
+    from main import EnhancedTokenBot
+
+    gwt.API_URL = f"{api_url}/token?uid={{}}&password={{}}"
+    gwt.console.quiet = True
+
+    bot = EnhancedTokenBot()
+    configure_for_cycles(bot, args.accounts)
+    results = []
+    try:
+        await bot.initialize()
+        await start_processing(bot)
+        bot.awaiting_setup[str(CHAT_ID)] = "repo_name"
+
+        # Warm up connections before measuring
+        for make_update in SCENARIOS.values():
+            await timed_update(bot, make_update())
+
+        for condition in ("idle", "cycle"):
+            stop = asyncio.Event()
+            cycle_task = None
+            if condition == "cycle":
+                cycle_task = asyncio.create_task(run_loop(bot, stop))
+                await asyncio.sleep(0.5)
+
+            for name, make_update in SCENARIOS.items():
+                result = await run_scenario(bot, make_update, args.bursts, args.burst_size)
+                results.append({"condition": condition, "handler": name, **result})
+
+            if cycle_task:
+                stop.set()
+                await cycle_task
+    finally:
+        await bot.cleanup()
+        fake_api.terminate()
+        fake_api.wait()
+
+    print(f"{'condition':<10}{'handler':<22}{'p50 ms':>9}{'p99 ms':>9}{'upd/s':>9}{'lag p99':>9}{'lag max':>9}")
+    for result in results:
+        print(f"{result['condition']:<10}{result['handler']:<22}{result['p50_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+              f"{result['throughput']:>9.1f}{result['lag_p99_ms']:>9.1f}{result['lag_max_ms']:>9.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
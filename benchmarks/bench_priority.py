@@ -0,0 +1,113 @@
+"""Command latency while a large cycle runs: on the event loop vs. in the background executor.
+
+Uses the bench_handlers setup (fake Bot API and upstream in a subprocess,
+synthetic updates through the real Application's update queue) and measures
+/status and button latency plus event-loop lag under three conditions:
+
+  * idle        no cycle running
+  * inline      process_json called directly on the event loop (previous execution model)
+  * background  EnhancedTokenBot.fetch_tokens (bounded, reniced executor with
+                CPU-heavy step limits and yield points)
+
+A fast upstream keeps the cycle CPU-bound (JSON, rich rendering, artifact
+writes). Pin the process to one core (taskset -c 0) to mimic a small container.
+
+Usage:  python benchmarks/bench_priority.py [--accounts 600] [--bursts 5] [--burst-size 20]
+"""
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import free_port, start_fake_api
+from bench_handlers import CHAT_ID, SCENARIOS, run_scenario, start_processing, timed_update, write_account_file
+
+MEASURED = ("status_command", "button_callback")
+
+async def inline_loop(process_json, account_file, pairs, stop):
+    while not stop.is_set():
+        process_json(account_file, uid_password_pairs=pairs, cached_tokens={})
+        await asyncio.sleep(0)
+
+async def background_loop(bot, account_file, pairs, stop):
+    while not stop.is_set():
+        await bot.fetch_tokens(account_file, pairs, {})
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=600)
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--burst-size", type=int, default=20)
+    parser.add_argument("--upstream-latency", type=float, default=0.005, help="fake token API delay (s)")
+    args = parser.parse_args()
+
+    # Run from a scratch directory so local config and artifacts are not touched
+    os.chdir(tempfile.mkdtemp(prefix="bench_priority_"))
+    os.environ["TELEGRAM_BOT_TOKEN"] = "123456:bench"
+    os.environ.pop("ADMIN_CHAT_ID", None)
+    os.environ.pop("WEBHOOK_URL", None)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    api_port = free_port()
+    api_url = f"http://127.0.0.1:{api_port}"
+    fake_api = start_fake_api(api_port, upstream_latency=args.upstream_latency)
+    os.environ["TELEGRAM_API_BASE_URL"] = api_url
+
+    import gwt
+    from main import EnhancedTokenBot
+    from runtime_config import runtime_config
+
+    gwt.API_URL = f"{api_url}/token?uid={{}}&password={{}}"
+    # Render to nowhere: the console work still happens, the terminal stays readable
+    gwt.console.file = open(os.devnull, "w")
+    # Keep the request pacing out of the way so the cycle is CPU-bound
+    runtime_config.set("request_delay", 0)
+    runtime_config.set("batch_delay", 0)
+    runtime_config.set("concurrency_limit", 16)
+
+    account_file = os.path.abspath("bench_accounts.json")
+    write_account_file(account_file, args.accounts)
+    with open(account_file) as f:
+        pairs = [(entry["uid"], entry["password"]) for entry in json.load(f)]
+
+    bot = EnhancedTokenBot()
+    results = []
+    try:
+        await bot.initialize()
+        await start_processing(bot)
+        bot.awaiting_setup[str(CHAT_ID)] = "repo_name"
+        for make_update in SCENARIOS.values():
+            await timed_update(bot, make_update())
+
+        for condition in ("idle", "inline", "background"):
+            stop = asyncio.Event()
+            cycle_task = None
+            if condition == "inline":
+                cycle_task = asyncio.create_task(inline_loop(gwt.process_json, account_file, pairs, stop))
+            elif condition == "background":
+                cycle_task = asyncio.create_task(background_loop(bot, account_file, pairs, stop))
+            await asyncio.sleep(0.5)
+
+            for name in MEASURED:
+                result = await run_scenario(bot, SCENARIOS[name], args.bursts, args.burst_size)
+                results.append({"condition": condition, "handler": name, **result})
+
+            if cycle_task:
+                stop.set()
+                await cycle_task
+    finally:
+        await bot.cleanup()
+        fake_api.terminate()
+        fake_api.wait()
+
+    print(f"{'condition':<12}{'handler':<18}{'p50 ms':>9}{'p99 ms':>9}{'upd/s':>9}{'lag p99':>9}{'lag max':>9}")
+    for result in results:
+        print(f"{result['condition']:<12}{result['handler']:<18}{result['p50_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+              f"{result['throughput']:>9.1f}{result['lag_p99_ms']:>9.1f}{result['lag_max_ms']:>9.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+"""Compare command round-trip latency and idle CPU between polling and webhook mode.
+
+Starts benchmarks/fake_bot_api.py in a subprocess, points the bot at it via
+TELEGRAM_API_BASE_URL and, for each mode, measures:
+
+  * round-trip latency of /status (update injected -> bot reply received)
+  * CPU used by the bot process while idle
+
+Usage:  python benchmarks/bench_webhook.py [--rounds 50] [--idle 20]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import argparse
+import statistics
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import free_port, start_fake_api
+
+CHAT_ID = 1000
+
+def command_update(text):
+    return {
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": {"id": CHAT_ID, "is_bot": False, "first_name": "Bench"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}],
+        }
+    }
+
+def inject(api_url, update):
+    request = urllib.request.Request(
+        f"{api_url}/_control/update",
+        data=json.dumps(update).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())["latency"]
+
+async def run_mode(mode, rounds, idle_seconds):
+    api_port = free_port()
+    api_url = f"http://127.0.0.1:{api_port}"
+    fake_api = start_fake_api(api_port)
+
+    os.environ["TELEGRAM_API_BASE_URL"] = api_url
+    if mode == "webhook":
+        webhook_port = free_port()
+        os.environ["WEBHOOK_URL"] = f"http://127.0.0.1:{webhook_port}"
+        os.environ["WEBHOOK_LISTEN"] = "127.0.0.1"
+        os.environ["WEBHOOK_PORT"] = str(webhook_port)
+    else:
+        os.environ.pop("WEBHOOK_URL", None)
+
+    from main import EnhancedTokenBot
+
+    bot = EnhancedTokenBot()
+    try:
+        await bot.initialize()
+        active_mode = await bot.start_frontend()
+
+        # Warm up connections before measuring
+        for _ in range(3):
+            await asyncio.to_thread(inject, api_url, command_update("/status"))
+
+        latencies = []
+        for _ in range(rounds):
+            latencies.append(await asyncio.to_thread(inject, api_url, command_update("/status")))
+
+        cpu_start = time.process_time()
+        await asyncio.sleep(idle_seconds)
+        idle_cpu = (time.process_time() - cpu_start) / idle_seconds * 100
+
+        latencies.sort()
+        return {
+            "mode": active_mode,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+            "mean_ms": statistics.mean(latencies) * 1000,
+            "idle_cpu_percent": idle_cpu,
+        }
+    finally:
+        await bot.cleanup()
+        fake_api.terminate()
+        fake_api.wait()
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--idle", type=float, default=20.0, help="idle CPU sampling window in seconds")
+    args = parser.parse_args()
+
+    # Run from a scratch directory so a local .secure_config.json is not picked up
+    os.chdir(tempfile.mkdtemp(prefix="bench_webhook_"))
+    os.environ["TELEGRAM_BOT_TOKEN"] = "123456:bench"
+    os.environ.pop("ADMIN_CHAT_ID", None)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    results = [await run_mode(mode, args.rounds, args.idle) for mode in ("polling", "webhook")]
+
+    print(f"{'mode':<10}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}{'idle CPU %':>12}")
+    for result in results:
+        print(f"{result['mode']:<10}{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+              f"{result['mean_ms']:>10.1f}{result['idle_cpu_percent']:>12.2f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
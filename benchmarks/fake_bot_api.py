@@ -0,0 +1,196 @@
+"""Local stand-in for the Telegram Bot API used by the benchmarks.
+
+Serves the handful of Bot API methods the bot calls (getMe, getUpdates,
+setWebhook, sendMessage, ...) plus control endpoints:
+
+    POST /_control/update   inject an update (delivered by webhook if one is set,
+                            otherwise returned from getUpdates); waits for the
+                            bot's next reply and returns {"latency": seconds}
+    GET  /_control/stats    request counters
+
+It also stands in for the upstream token API (GET /token?uid=..&password=..)
+with a configurable response latency.
+
+Run standalone:  python benchmarks/fake_bot_api.py --port 8081
+"""
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import asyncio
+import argparse
+import subprocess
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from webhook_server import read_http_request, http_response
+
+REPLY_METHODS = ("sendMessage", "editMessageText")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_fake_api(port, upstream_latency=0.2):
+    """Run the fake API in a subprocess so its CPU is not counted against the bot"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--port", str(port), "--upstream-latency", str(upstream_latency)],
+        stdout=subprocess.PIPE
+    )
+    process.stdout.readline()  # wait for "listening"
+    return process
+
+class FakeBotAPI:
+    def __init__(self, upstream_latency=0.2):
+        self.upstream_latency = upstream_latency
+        self.pending = asyncio.Queue()
+        self.webhook_url = None
+        self.webhook_secret = None
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.reply_waiters = []
+        self.counters = {}
+
+    def _params(self, target, headers, body):
+        params = {key: values[-1] for key, values in parse_qs(urlsplit(target).query).items()}
+        content_type = headers.get("content-type", "")
+        if body and "json" in content_type:
+            params.update(json.loads(body))
+        elif body:
+            params.update({key: values[-1] for key, values in parse_qs(body.decode()).items()})
+        return params
+
+    def _message(self, params):
+        self.next_message_id += 1
+        return {
+            "message_id": self.next_message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+            "text": params.get("text", ""),
+        }
+
+    async def bot_method(self, method, params):
+        self.counters[method] = self.counters.get(method, 0) + 1
+
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                    "can_join_groups": True, "can_read_all_group_messages": False,
+                    "supports_inline_queries": False}
+        if method == "getUpdates":
+            timeout = float(params.get("timeout", 0))
+            updates = []
+            try:
+                updates.append(await asyncio.wait_for(self.pending.get(), timeout=max(timeout, 0.01)))
+            except asyncio.TimeoutError:
+                pass
+            while not self.pending.empty():
+                updates.append(self.pending.get_nowait())
+            return updates
+        if method == "setWebhook":
+            self.webhook_url = params.get("url")
+            self.webhook_secret = params.get("secret_token")
+            return True
+        if method == "deleteWebhook":
+            self.webhook_url = None
+            return True
+        if method in REPLY_METHODS:
+            for waiter in self.reply_waiters:
+                if not waiter.done():
+                    waiter.set_result(time.perf_counter())
+            self.reply_waiters = []
+            return self._message(params)
+        return True
+
+    async def deliver_webhook(self, update):
+        url = urlsplit(self.webhook_url)
+        reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+        body = json.dumps(update).encode()
+        headers = (
+            f"POST {url.path or '/'} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"X-Telegram-Bot-Api-Secret-Token: {self.webhook_secret or ''}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(headers.encode() + body)
+        await writer.drain()
+        await reader.read()
+        writer.close()
+
+    async def inject(self, update):
+        """Deliver an update and wait for the bot's reply"""
+        update["update_id"] = self.next_update_id
+        self.next_update_id += 1
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.reply_waiters.append(waiter)
+        start = time.perf_counter()
+
+        if self.webhook_url:
+            await self.deliver_webhook(update)
+        else:
+            await self.pending.put(update)
+
+        replied_at = await asyncio.wait_for(waiter, timeout=30)
+        return {"latency": replied_at - start}
+
+    async def upstream_token(self, params):
+        """Fake JWT for the token API, expiring in 8 hours"""
+        await asyncio.sleep(self.upstream_latency)
+        payload = base64.urlsafe_b64encode(json.dumps({
+            "uid": params.get("uid"),
+            "exp": int(time.time()) + 8 * 3600,
+        }).encode()).decode().rstrip("=")
+        return {"token": f"eyJhbGciOiJIUzI1NiJ9.{payload}.bench"}
+
+    async def handle_request(self, method, target, headers, body):
+        path = urlsplit(target).path
+        if path == "/token":
+            result = await self.upstream_token(self._params(target, headers, body))
+            return http_response(200, json.dumps(result).encode())
+        if path == "/_control/update":
+            result = await self.inject(json.loads(body))
+            return http_response(200, json.dumps(result).encode())
+        if path == "/_control/stats":
+            return http_response(200, json.dumps(self.counters).encode())
+
+        # /bot<token>/<method>
+        parts = path.strip("/").split("/")
+        if len(parts) != 2 or not parts[0].startswith("bot"):
+            return http_response(404)
+
+        result = await self.bot_method(parts[1], self._params(target, headers, body))
+        return http_response(200, json.dumps({"ok": True, "result": result}).encode())
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_http_request(reader)
+                if request is None:
+                    break
+                writer.write(await self.handle_request(*request))
+                await writer.drain()
+                if request[2].get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(host, port, upstream_latency):
+    api = FakeBotAPI(upstream_latency)
+    server = await asyncio.start_server(api.handle_connection, host, port)
+    print(f"fake Bot API listening on {host}:{port}", flush=True)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="token API response delay (s)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.upstream_latency))
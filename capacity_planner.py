@@ -0,0 +1,247 @@
+import os
+import json
+import math
+import statistics
+from datetime import datetime, timezone
+import logging
+
+from runtime_config import runtime_config, TUNABLES
+
+logger = logging.getLogger(__name__)
+
+# One JSON line per cycle with request telemetry and the forecast made before it
+TELEMETRY_FILE = "cycle_telemetry.jsonl"
+# Default /plan target: every account refreshed at least this often
+PLANNER_FRESHNESS_HOURS = float(os.getenv("PLANNER_FRESHNESS_HOURS", "24"))
+# Cycles used for the model (most recent first)
+PLANNER_HISTORY = int(os.getenv("PLANNER_HISTORY", "20"))
+# Telemetry file is trimmed to the most recent records once it grows past this many
+PLANNER_MAX_RECORDS = int(os.getenv("PLANNER_MAX_RECORDS", "500"))
+# Share of requests answered with 429 above which a request rate counts as over the limit
+PLANNER_MAX_429_RATE = float(os.getenv("PLANNER_MAX_429_RATE", "0.01"))
+# Recommended settings keep the cycle within this share of the interval
+PLANNER_DURATION_BUDGET = float(os.getenv("PLANNER_DURATION_BUDGET", "0.5"))
+# How far past the highest clean observed rate a recommendation may go
+PLANNER_RATE_HEADROOM = float(os.getenv("PLANNER_RATE_HEADROOM", "1.25"))
+
+class CapacityPlanner:
+    """Forecasts cycle duration and upstream request rate from observed cycle telemetry.
+
+    The model is deliberately simple: a cycle is ceil(N / concurrency)
+    batches, each as slow as its slowest request (observed p95 latency) plus
+    the request delay, with the batch delay in between; failed requests add
+    retry attempts at the observed error rate. Every forecast is stored with
+    the cycle it was made for so its accuracy can be checked.
+    """
+
+    def __init__(self, path=TELEMETRY_FILE, max_records=PLANNER_MAX_RECORDS):
+        self.path = path
+        self.max_records = max_records
+        self._cache = (None, [])  # ((mtime, size), records oldest first)
+
+    def _records(self):
+        """All telemetry records, re-read only when the file changed"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        key = (stat.st_mtime_ns, stat.st_size)
+        if self._cache[0] == key:
+            return self._cache[1]
+
+        records = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        records.append(json.loads(line))
+        except Exception as e:
+            logger.error(f"Error reading cycle telemetry: {e}")
+        self._cache = (key, records)
+        return records
+
+    def history(self, limit=PLANNER_HISTORY):
+        """Most recent telemetry records, newest first"""
+        return self._records()[::-1][:limit]
+
+    def record(self, telemetry, forecast=None):
+        """Append a finished cycle's telemetry (and the forecast made for it)"""
+        if not telemetry.get("requests"):
+            return
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            **telemetry,
+            "request_rate": telemetry["requests"] / max(telemetry["duration"], 1e-6),
+            "forecast": forecast,
+        }
+
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            self._trim()
+        except Exception as e:
+            logger.error(f"Error recording cycle telemetry: {e}")
+
+    def _trim(self):
+        """Keep the file at max_records by rewriting it once it exceeds that by a margin"""
+        records = self._records()
+        if len(records) <= self.max_records * 1.2:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records[-self.max_records:]:
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def observed(self, history=None):
+        """Latency, error and rate-limit figures over recent cycles, or None without data"""
+        history = history if history is not None else self.history()
+        history = [record for record in history if record.get("requests")]
+        if not history:
+            return None
+
+        total_requests = sum(record["requests"] for record in history)
+        rate_429 = sum(record["rate_limited"] for record in history) / total_requests
+        failed = sum(record["rate_limited"] + record["errors"] for record in history) / total_requests
+
+        clean_rates = [r["request_rate"] for r in history if r["rate_limited"] / r["requests"] <= PLANNER_MAX_429_RATE]
+        limited_rates = [r["request_rate"] for r in history if r["rate_limited"] / r["requests"] > PLANNER_MAX_429_RATE]
+
+        return {
+            "cycles": len(history),
+            "latency_mean": statistics.median(record["latency_mean"] for record in history),
+            "latency_p95": statistics.median(record["latency_p95"] for record in history),
+            "failure_rate": failed,
+            "rate_429": rate_429,
+            "max_clean_rate": max(clean_rates) if clean_rates else None,
+            "min_limited_rate": min(limited_rates) if limited_rates else None,
+        }
+
+    def rate_ceiling(self, observed):
+        """Highest request rate a recommendation may use, or None when nothing is known"""
+        if observed["min_limited_rate"] is not None:
+            return observed["min_limited_rate"] * 0.8
+        if observed["max_clean_rate"] is not None:
+            return observed["max_clean_rate"] * PLANNER_RATE_HEADROOM
+        return None
+
+    def predict(self, accounts, settings=None, observed=None):
+        """Forecast {"duration", "requests", "request_rate"} for a cycle, or None without telemetry"""
+        observed = observed or self.observed()
+        if not observed or accounts <= 0:
+            return None
+
+        settings = {**{name: runtime_config.get(name) for name in TUNABLES}, **(settings or {})}
+        concurrency = settings["concurrency_limit"]
+        max_retries = settings["max_retries"]
+
+        # Expected attempts per account with independent failures, capped at max_retries
+        failure = min(observed["failure_rate"], 0.99)
+        attempts = sum(failure ** k for k in range(max_retries))
+        retry_requests = accounts * (attempts - 1)
+
+        batches = math.ceil(accounts / concurrency)
+        first_pass = (batches * (settings["request_delay"] + observed["latency_p95"])
+                      + (batches - 1) * settings["batch_delay"])
+        retry_pass = 0.0
+        if retry_requests >= 0.5:
+            retry_pass = retry_requests / concurrency * observed["latency_mean"] + settings["retry_delay"] * max_retries
+
+        duration = first_pass + retry_pass
+        requests_made = accounts * attempts
+        return {
+            "accounts": accounts,
+            "duration": duration,
+            "requests": requests_made,
+            "request_rate": requests_made / max(duration, 1e-6),
+            "concurrency_limit": concurrency,
+        }
+
+    def recommend(self, freshness_hours, accounts_per_file, file_count):
+        """Cheapest settings that refresh every account within `freshness_hours` under the rate ceiling"""
+        observed = self.observed()
+        if not observed:
+            return None
+
+        # Files are processed round-robin, so each account is refreshed every file_count intervals
+        interval_min, interval_max = TUNABLES["interval_hours"][1:3]
+        interval_hours = min(interval_max, max(interval_min, freshness_hours / max(1, file_count)))
+        budget = interval_hours * 3600 * PLANNER_DURATION_BUDGET
+        ceiling = self.rate_ceiling(observed)
+
+        concurrency_min, concurrency_max = TUNABLES["concurrency_limit"][1:3]
+        best = None
+        for concurrency in range(concurrency_min, concurrency_max + 1):
+            forecast = self.predict(accounts_per_file, {"concurrency_limit": concurrency}, observed)
+            if ceiling is not None and forecast["request_rate"] > ceiling:
+                break
+            best = forecast
+            if forecast["duration"] <= budget:
+                return {"feasible": True, "interval_hours": interval_hours, "forecast": forecast,
+                        "rate_ceiling": ceiling, "observed": observed}
+
+        # Infeasible: report what the fastest allowed setting achieves
+        achievable_hours = None
+        if best:
+            achievable_hours = best["duration"] / PLANNER_DURATION_BUDGET / 3600 * max(1, file_count)
+        return {"feasible": False, "interval_hours": interval_hours, "forecast": best,
+                "rate_ceiling": ceiling, "observed": observed, "achievable_freshness_hours": achievable_hours}
+
+    def accuracy(self, history=None):
+        """Forecast vs. actual duration for cycles that had a forecast"""
+        history = history if history is not None else self.history()
+        pairs = [(record["forecast"]["duration"], record["duration"])
+                 for record in history if record.get("forecast") and record.get("duration")]
+        if not pairs:
+            return None
+        errors = [abs(predicted - actual) / actual for predicted, actual in pairs]
+        return {
+            "cycles": len(pairs),
+            "mean_error": statistics.mean(errors),
+            "last_predicted": pairs[0][0],
+            "last_actual": pairs[0][1],
+        }
+
+def format_plan(recommendation, accuracy, freshness_hours, accounts_per_file, file_count):
+    """Multi-line planner report for /plan"""
+    if not recommendation:
+        return "📐 Capacity Plan\n\n⚠️ No cycle telemetry yet - run a cycle first"
+
+    observed = recommendation["observed"]
+    lines = [
+        "📐 Capacity Plan",
+        "",
+        f"🎯 Target: every account within {freshness_hours:g}h ({file_count} files x {accounts_per_file} accounts)",
+        f"📊 Observed ({observed['cycles']} cycles): latency {observed['latency_mean']:.2f}s mean / "
+        f"{observed['latency_p95']:.2f}s p95, failures {observed['failure_rate']:.1%}, 429s {observed['rate_429']:.1%}",
+        f"🚦 Rate ceiling: {recommendation['rate_ceiling']:.2f} req/s" if recommendation["rate_ceiling"] else
+        "🚦 Rate ceiling: unknown",
+    ]
+
+    forecast = recommendation["forecast"]
+    if recommendation["feasible"]:
+        lines += [
+            "",
+            "✅ Recommended:",
+            f"• interval_hours = {recommendation['interval_hours']:.2f}",
+            f"• concurrency_limit = {forecast['concurrency_limit']}",
+            f"⏱️ Forecast: {forecast['duration'] / 60:.1f} min per cycle, {forecast['request_rate']:.2f} req/s",
+            f"Apply with /tune interval_hours {recommendation['interval_hours']:.2f} and "
+            f"/tune concurrency_limit {forecast['concurrency_limit']}",
+        ]
+    else:
+        lines += ["", "❌ Target not reachable within the observed rate limits"]
+        if forecast:
+            lines.append(f"• Best: concurrency_limit = {forecast['concurrency_limit']}, "
+                         f"{forecast['duration'] / 60:.1f} min per cycle")
+        if recommendation.get("achievable_freshness_hours"):
+            lines.append(f"• Achievable freshness: ~{recommendation['achievable_freshness_hours']:.1f}h "
+                         "(or split accounts into smaller files)")
+
+    if accuracy:
+        lines += [
+            "",
+            f"🧪 Forecast error: {accuracy['mean_error']:.0%} mean over {accuracy['cycles']} cycles "
+            f"(last: {accuracy['last_predicted']:.0f}s predicted, {accuracy['last_actual']:.0f}s actual)",
+        ]
+    return "\n".join(lines)
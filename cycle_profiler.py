@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from datetime import datetime, timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Profiler of the cycle currently being profiled, if any
+_active = None
+
+def active_profiler():
+    return _active
+
+class CycleProfiler:
+    """Deterministic profiler covering the calling thread and the work it hands to other threads.
+
+    Callables submitted to worker threads (background executor, gwt fetch
+    pools) are covered by wrap(), which enables a per-thread cProfile only
+    for the duration of the call and disables it in the same thread, so no
+    pool thread stays profiled after stop(). All profiles are merged into
+    one report on stop. Nothing is installed unless start() is called.
+    """
+
+    def __init__(self, top_n=15):
+        self.top_n = top_n
+        self._main_profile = None
+        self._thread_profiles = {}  # thread id -> cProfile reused across wrapped calls
+        self._lock = threading.Lock()
+        self._started_at = None
+
+    def _thread_profile(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            profile = self._thread_profiles.get(thread_id)
+            if profile is None:
+                profile = self._thread_profiles[thread_id] = cProfile.Profile()
+        return profile
+
+    def wrap(self, func):
+        """Profile each call of `func` in whatever thread runs it"""
+        def profiled(*args, **kwargs):
+            if sys.getprofile() is not None:
+                # Nested wrap, or the thread is profiled already
+                return func(*args, **kwargs)
+            profile = self._thread_profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler owns this thread (Python 3.12+)
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+        return profiled
+
+    def start(self):
+        global _active
+        _active = self
+        self._started_at = time.monotonic()
+        self._main_profile = cProfile.Profile()
+        self._main_profile.enable()
+
+    def stop(self):
+        """Stop profiling and return merged pstats.Stats"""
+        global _active
+        _active = None
+        self._main_profile.disable()
+
+        stats = pstats.Stats(self._main_profile)
+        with self._lock:
+            thread_profiles = list(self._thread_profiles.values())
+        for profile in thread_profiles:
+            # Disabled in its own thread already; only a call still in flight keeps collecting
+            profile.create_stats()
+            if profile.stats:
+                stats.add(profile)
+        return stats, len(thread_profiles)
+
+    def save(self, stats, label="cycle"):
+        """Dump the full profile to PROFILE_DIR and return its path"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(PROFILE_DIR, f"{label}_{timestamp}.prof")
+        stats.dump_stats(path)
+        return path
+
+    def report(self, stats, thread_count):
+        """Compact top-N hot function report sorted by own time"""
+        stats.sort_stats("tottime")
+        elapsed = time.monotonic() - self._started_at
+        lines = [f"⏱️ Wall: {elapsed:.2f}s | Threads profiled: {thread_count + 1}"]
+
+        for func in stats.fcn_list[:self.top_n]:
+            primitive_calls, total_calls, own_time, cumulative_time, _ = stats.stats[func]
+            filename, line, name = func
+            location = f"{os.path.basename(filename)}:{line}" if line else filename
+            lines.append(f"{own_time:7.3f}s {cumulative_time:7.3f}s {total_calls:>7} {name} ({location})")
+        return "\n".join(lines)
+
+def profiling_requested_by_env():
+    """PROFILE_NEXT_CYCLE=1 profiles the first cycle after startup"""
+    return os.getenv("PROFILE_NEXT_CYCLE", "").lower() in ("1", "true", "yes")
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How a trigger was resolved by the queue
+RESOLUTION_MESSAGES = {
+    "started": "▶️ Started a new cycle",
+    "joined": "🔗 A cycle was already running - attached to its result",
+    "queued": "⏳ Queued to run right after the current cycle",
+    "coalesced": "🔁 Merged into the cycle already queued",
+}
+
+class CycleQueue:
+    """Single-flight executor for process_cycle.
+
+    At most one cycle runs at a time and at most one more is queued.
+    Triggers arriving during a run either attach to it (attach=True) or
+    queue one follow-up cycle that later triggers coalesce into.
+    """
+
+    def __init__(self, run_cycle):
+        self._run_cycle = run_cycle
+        self._current = None    # running asyncio.Task
+        self._pending = None    # (future, kwargs) of the queued cycle
+
+    @property
+    def running(self):
+        return self._current is not None
+
+    @property
+    def queued(self):
+        return self._pending is not None
+
+    async def submit(self, attach=True, **kwargs):
+        """Trigger a cycle. Returns (resolution, result)."""
+        if self._current is None:
+            task = self._start(kwargs)
+            return "started", await asyncio.shield(task)
+
+        if attach:
+            return "joined", await asyncio.shield(self._current)
+
+        if self._pending is not None:
+            future, queued_kwargs = self._pending
+            self._pending = (future, merge_trigger_kwargs(queued_kwargs, kwargs))
+            return "coalesced", await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending = (future, kwargs)
+        logger.info("⏳ Cycle already running - queued one follow-up cycle")
+        return "queued", await asyncio.shield(future)
+
+    def _start(self, kwargs, future=None):
+        task = asyncio.create_task(self._run_cycle(**kwargs))
+        self._current = task
+        task.add_done_callback(lambda finished: self._on_done(finished, future))
+        return task
+
+    def _on_done(self, task, future):
+        self._current = None
+
+        if future is not None and not future.done():
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+        if self._pending is not None:
+            pending_future, kwargs = self._pending
+            self._pending = None
+            self._start(kwargs, pending_future)
+
+def merge_trigger_kwargs(queued, new):
+    """Flags of triggers that coalesce: booleans are OR-ed (one manual trigger makes the run manual), others take the latest value"""
+    merged = dict(queued)
+    for name, value in new.items():
+        if isinstance(value, bool) and isinstance(merged.get(name), bool):
+            merged[name] = merged[name] or value
+        else:
+            merged[name] = value
+    return merged
+
+def describe_resolution(resolution):
+    return RESOLUTION_MESSAGES.get(resolution, resolution)
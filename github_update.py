@@ -1,17 +1,31 @@
 import os
 import json
+import time
+import asyncio
 import requests
+import httpx
 import base64
+import hashlib
 from datetime import datetime, timezone
 from dotenv import load_dotenv
 import logging
 
+from backup_store import BackupStore
+from background_work import cpu_slot, yield_point
+
 # Load environment variables
 load_dotenv()
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+# Files above this size bypass the Contents API (1MB limit) and go through the Git Data API
+LARGE_FILE_BYTES = int(os.getenv("GITHUB_LARGE_FILE_BYTES", str(900 * 1024)))
+BLOB_CHUNK_BYTES = 3 * 256 * 1024
+# Error responses (401/404/...) are cached only briefly so a fixed token or repo shows up quickly
+GITHUB_ERROR_CACHE_SECONDS = float(os.getenv("GITHUB_ERROR_CACHE_SECONDS", "5"))
+
 # Global variables for runtime tokens
 _github_token = None
 _repo_name = None
@@ -37,12 +51,166 @@ def get_github_credentials():
     
     return token, repo
 
-def push_to_github():
+COUNT_CHUNK_CHARS = 64 * 1024
+_json_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+class _EntryReader:
+    """Incremental reader over a text file for _count_entries: keeps a small window, never the document"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.f.read(COUNT_CHUNK_CHARS)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ("" at end of file)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise Exception(f"Local file is not valid JSON: expected {' or '.join(chars)}, got {char or 'end of file'}")
+        self.pos += 1
+        return char
+
+    def skip_value(self):
+        """Decode one value (discarded); the window grows only to the size of that value"""
+        self.peek()
+        while True:
+            try:
+                _, end = _json_decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                if self.eof or not self._fill():
+                    raise Exception(f"Local file is not valid JSON: {e}")
+                continue
+            # A number at the window edge may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            yield_point()
+            return
+
+def _count_entries(f):
+    """Top-level entry count of a JSON list or object, parsed one entry at a time"""
+    reader = _EntryReader(f)
+    opening = reader.expect("[{")
+    closing = "]" if opening == "[" else "}"
+
+    count = 0
+    if reader.peek() == closing:
+        reader.pos += 1
+    else:
+        while True:
+            if opening == "{":
+                if reader.peek() != '"':
+                    raise Exception("Local file is not valid JSON: object keys must be strings")
+                reader.skip_value()
+                reader.expect(":")
+            reader.skip_value()
+            count += 1
+            if reader.expect("," + closing) == closing:
+                break
+
+    if reader.peek():
+        raise Exception("Local file is not valid JSON: unexpected data after the top-level value")
+    return count
+
+def git_blob_sha(local_file_path):
+    """Git blob SHA of a file, computed in chunks (what GitHub reports as the file's sha)"""
+    digest = hashlib.sha1(f"blob {os.path.getsize(local_file_path)}\0".encode())
+    with open(local_file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(BLOB_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _stream_blob_body(local_file_path):
+    """JSON body for POST /git/blobs, base64-encoded chunk by chunk"""
+    yield b'{"encoding": "base64", "content": "'
+    with open(local_file_path, "rb") as f:
+        # Chunks are a multiple of 3 bytes, so the encoded pieces concatenate without padding
+        for chunk in iter(lambda: f.read(BLOB_CHUNK_BYTES), b""):
+            yield base64.b64encode(chunk)
+            yield_point()
+    yield b'"}'
+
+def _api_error(response, action):
+    try:
+        details = response.json().get("message", "")
+    except ValueError:
+        details = response.text[:200]
+    return Exception(f"⚠ GitHub API Error while {action}: {response.status_code}\nDetails: {details}")
+
+def _push_large_file(local_file_path, file_path_in_repo, repo_name, branch, headers, commit_message, local_sha):
+    """Commit a file through the Git Data API (blob -> tree -> commit -> ref), avoiding the Contents API size limit"""
+    api = f"{GITHUB_API_URL}/repos/{repo_name}/git"
+
+    blob_response = requests.post(
+        f"{api}/blobs",
+        headers={**headers, "Content-Type": "application/json"},
+        data=_stream_blob_body(local_file_path),
+        timeout=300
+    )
+    if blob_response.status_code != 201:
+        raise _api_error(blob_response, "uploading blob")
+    blob_sha = blob_response.json()["sha"]
+    if blob_sha != local_sha:
+        raise Exception(f"⚠ Uploaded blob {blob_sha[:7]} does not match local file {local_sha[:7]}")
+
+    ref_response = requests.get(f"{api}/ref/heads/{branch}", headers=headers, timeout=30)
+    if ref_response.status_code != 200:
+        raise _api_error(ref_response, f"reading branch {branch}")
+    parent_sha = ref_response.json()["object"]["sha"]
+
+    parent_response = requests.get(f"{api}/commits/{parent_sha}", headers=headers, timeout=30)
+    if parent_response.status_code != 200:
+        raise _api_error(parent_response, "reading parent commit")
+
+    tree_response = requests.post(f"{api}/trees", headers=headers, timeout=60, json={
+        "base_tree": parent_response.json()["tree"]["sha"],
+        "tree": [{"path": file_path_in_repo, "mode": "100644", "type": "blob", "sha": blob_sha}]
+    })
+    if tree_response.status_code != 201:
+        raise _api_error(tree_response, "creating tree")
+
+    commit_response = requests.post(f"{api}/commits", headers=headers, timeout=60, json={
+        "message": commit_message,
+        "tree": tree_response.json()["sha"],
+        "parents": [parent_sha]
+    })
+    if commit_response.status_code != 201:
+        raise _api_error(commit_response, "creating commit")
+    commit_sha = commit_response.json()["sha"]
+
+    # Not forced: fails if the branch moved since we read it
+    update_response = requests.patch(f"{api}/refs/heads/{branch}", headers=headers, timeout=30, json={"sha": commit_sha})
+    if update_response.status_code == 422:
+        raise Exception("⚠ Conflict: Branch was updated by someone else")
+    if update_response.status_code != 200:
+        raise _api_error(update_response, f"updating branch {branch}")
+    return commit_sha
+
+def push_to_github(local_file_path="token_ind.json", file_path_in_repo=None):
     """Enhanced GitHub push with better error handling and metrics"""
     token, repo_name = get_github_credentials()
     branch = os.getenv("BRANCH", "main")
-    file_path_in_repo = "token_ind.json"
-    local_file_path = "token_ind.json"
+    file_path_in_repo = file_path_in_repo or os.path.basename(local_file_path)
     
     if not token or not repo_name:
         raise Exception("GitHub credentials not set. Use /setup command first.")
@@ -51,14 +219,10 @@ def push_to_github():
     if not os.path.exists(local_file_path):
         raise Exception(f"Local file {local_file_path} not found")
     
-    # Read and validate local file content
+    # Validate local file content
     try:
-        with open(local_file_path, "r", encoding="utf-8") as f:
-            new_content = f.read()
-        
-        # Validate JSON format
-        token_data = json.loads(new_content)
-        token_count = len(token_data)
+        with open(local_file_path, "r", encoding="utf-8") as f, cpu_slot():
+            token_count = _count_entries(f)
         
         if token_count == 0:
             raise Exception("No tokens found in local file")
@@ -68,6 +232,9 @@ def push_to_github():
     except Exception as e:
         raise Exception(f"Error reading local file: {str(e)}")
     
+    file_size = os.path.getsize(local_file_path)
+    local_sha = git_blob_sha(local_file_path)
+    
     # GitHub API headers
     headers = {
         "Authorization": f"token {token}",
@@ -76,7 +243,7 @@ def push_to_github():
     }
     
     # Get repository info first (to validate access)
-    repo_url = f"https://api.github.com/repos/{repo_name}"
+    repo_url = f"{GITHUB_API_URL}/repos/{repo_name}"
     repo_response = requests.get(repo_url, headers=headers, timeout=30)
     
     if repo_response.status_code != 200:
@@ -88,30 +255,22 @@ def push_to_github():
             raise Exception(f"Cannot access repository {repo_name}: {repo_response.status_code}")
     
     # Get current file info (if exists)
-    get_url = f"https://api.github.com/repos/{repo_name}/contents/{file_path_in_repo}"
-    response = requests.get(get_url, headers=headers, timeout=30)
+    get_url = f"{GITHUB_API_URL}/repos/{repo_name}/contents/{file_path_in_repo}"
+    response = requests.get(get_url, headers=headers, params={"ref": branch}, timeout=30)
     
     # Prepare enhanced commit message with timestamp and metrics
     timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
     commit_message = f"📄 Update {file_path_in_repo} - {token_count} tokens | {timestamp}"
     
-    # Prepare commit data
-    commit_data = {
-        "message": commit_message,
-        "content": base64.b64encode(new_content.encode()).decode(),
-        "branch": branch
-    }
-    
     # Check if file exists and handle accordingly
+    remote_sha = None
     if response.status_code == 200:
         # File exists, update it
-        file_info = response.json()
-        commit_data["sha"] = file_info["sha"]
+        remote_sha = response.json()["sha"]
         action = "Updated"
         
-        # Check if content is different (avoid unnecessary commits)
-        current_content = base64.b64decode(file_info["content"]).decode()
-        if current_content.strip() == new_content.strip():
+        # Compare blob SHAs only: GitHub omits `content` for files over 1MB
+        if remote_sha == local_sha:
             return f"⚡ No changes detected - {file_path_in_repo} is already up to date"
             
     elif response.status_code == 404:
@@ -120,48 +279,31 @@ def push_to_github():
     else:
         raise Exception(f"Error checking file status: {response.status_code} - {response.text}")
     
-    # Push to GitHub with retry mechanism
-    put_url = f"https://api.github.com/repos/{repo_name}/contents/{file_path_in_repo}"
-    
     try:
-        push_response = requests.put(put_url, headers=headers, json=commit_data, timeout=60)
-        
-        if push_response.status_code in [200, 201]:
-            # Success - get commit details
-            commit_info = push_response.json()
-            commit_sha = commit_info.get("commit", {}).get("sha", "unknown")[:7]
-            
-            success_msg = f"✅ {action} {file_path_in_repo} in {repo_name}"
-            success_msg += f"\n📊 Tokens: {token_count}"
-            success_msg += f"\n🔗 Commit: {commit_sha}"
-            success_msg += f"\n📅 Time: {timestamp}"
-            
-            logger.info(f"GitHub push successful: {action} {file_path_in_repo} - {token_count} tokens")
-            return success_msg
-            
+        if file_size > LARGE_FILE_BYTES:
+            # Large artifact: streamed blob upload instead of the size-limited Contents API
+            commit_sha = _push_large_file(
+                local_file_path, file_path_in_repo, repo_name, branch, headers, commit_message, local_sha
+            )[:7]
         else:
-            # Handle specific error codes
-            if push_response.status_code == 409:
-                error_msg = "⚠ Conflict: File was modified by someone else"
-            elif push_response.status_code == 422:
-                error_msg = "⚠ Validation error: Invalid file content or branch"
-            elif push_response.status_code == 403:
-                error_msg = "⚠ Permission denied: Check GitHub token permissions"
-            elif push_response.status_code == 404:
-                error_msg = f"⚠ Repository or branch not found: {repo_name}/{branch}"
-            else:
-                error_msg = f"⚠ GitHub API Error: {push_response.status_code}"
-            
-            # Add response details for debugging
-            try:
-                error_details = push_response.json()
-                if "message" in error_details:
-                    error_msg += f"\nDetails: {error_details['message']}"
-            except:
-                error_msg += f"\nResponse: {push_response.text[:200]}"
+            with open(local_file_path, "rb") as f:
+                commit_data = {
+                    "message": commit_message,
+                    "content": base64.b64encode(f.read()).decode(),
+                    "branch": branch
+                }
+            if remote_sha:
+                commit_data["sha"] = remote_sha
+            commit_sha = _put_contents(get_url, headers, commit_data, repo_name, branch)
             
-            logger.error(f"GitHub push failed: {error_msg}")
-            raise Exception(error_msg)
+        success_msg = f"✅ {action} {file_path_in_repo} in {repo_name}"
+        success_msg += f"\n📊 Tokens: {token_count}"
+        success_msg += f"\n🔗 Commit: {commit_sha}"
+        success_msg += f"\n📅 Time: {timestamp}"
+        
+        logger.info(f"GitHub push successful: {action} {file_path_in_repo} - {token_count} tokens ({file_size} bytes)")
+        github_client.invalidate()
+        return success_msg
             
     except requests.exceptions.Timeout:
         raise Exception("⚠ GitHub API timeout - please try again")
@@ -170,23 +312,60 @@ def push_to_github():
     except requests.exceptions.RequestException as e:
         raise Exception(f"⚠ Request error: {str(e)}")
 
-def create_backup():
-    """Create backup of current token file"""
+def _put_contents(put_url, headers, commit_data, repo_name, branch):
+    """Create or update a file through the Contents API; returns the short commit SHA"""
+    push_response = requests.put(put_url, headers=headers, json=commit_data, timeout=60)
+    
+    if push_response.status_code in [200, 201]:
+        commit_info = push_response.json()
+        return commit_info.get("commit", {}).get("sha", "unknown")[:7]
+    
+    # Handle specific error codes
+    if push_response.status_code == 409:
+        error_msg = "⚠ Conflict: File was modified by someone else"
+    elif push_response.status_code == 422:
+        error_msg = "⚠ Validation error: Invalid file content or branch"
+    elif push_response.status_code == 403:
+        error_msg = "⚠ Permission denied: Check GitHub token permissions"
+    elif push_response.status_code == 404:
+        error_msg = f"⚠ Repository or branch not found: {repo_name}/{branch}"
+    else:
+        error_msg = f"⚠ GitHub API Error: {push_response.status_code}"
+    
+    # Add response details for debugging
+    try:
+        error_details = push_response.json()
+        if "message" in error_details:
+            error_msg += f"\nDetails: {error_details['message']}"
+    except:
+        error_msg += f"\nResponse: {push_response.text[:200]}"
+    
+    logger.error(f"GitHub push failed: {error_msg}")
+    raise Exception(error_msg)
+
+def create_backup(label=None):
+    """Snapshot the current token file into the content-addressed backup store"""
     try:
         if not os.path.exists("token_ind.json"):
             return "⚠️ No token file to backup"
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"backup_token_ind_{timestamp}.json"
-        
-        with open("token_ind.json", "r") as src, open(backup_filename, "w") as dst:
-            dst.write(src.read())
+        snapshot, is_new_object = BackupStore().snapshot("token_ind.json", label=label)
         
-        return f"✅ Backup created: {backup_filename}"
+        if is_new_object:
+            return f"✅ Backup created: {snapshot['id']}"
+        return f"✅ Backup recorded (content already stored): {snapshot['id']}"
         
     except Exception as e:
         return f"⚠ Backup failed: {str(e)}"
 
+def restore_backup(snapshot_id=None):
+    """Restore token_ind.json from a backup snapshot (latest when no id given)"""
+    try:
+        snapshot = BackupStore().restore(snapshot_id, "token_ind.json")
+        return f"✅ Restored {snapshot['id']} ({snapshot['size']} bytes)"
+    except Exception as e:
+        return f"⚠ Restore failed: {str(e)}"
+
 def validate_github_connection():
     """Test GitHub connection and permissions"""
     try:
@@ -201,7 +380,7 @@ def validate_github_connection():
         }
         
         # Test repository access
-        repo_url = f"https://api.github.com/repos/{repo_name}"
+        repo_url = f"{GITHUB_API_URL}/repos/{repo_name}"
         response = requests.get(repo_url, headers=headers, timeout=15)
         
         if response.status_code == 200:
@@ -231,14 +410,14 @@ def get_repo_stats():
         }
         
         # Get repository info
-        repo_url = f"https://api.github.com/repos/{repo_name}"
+        repo_url = f"{GITHUB_API_URL}/repos/{repo_name}"
         response = requests.get(repo_url, headers=headers, timeout=15)
         
         if response.status_code == 200:
             repo_info = response.json()
             
             # Get recent commits
-            commits_url = f"https://api.github.com/repos/{repo_name}/commits"
+            commits_url = f"{GITHUB_API_URL}/repos/{repo_name}/commits"
             commits_response = requests.get(commits_url, headers=headers, params={"per_page": 5}, timeout=15)
             
             stats = {
@@ -254,6 +433,130 @@ def get_repo_stats():
         logger.error(f"Error getting repo stats: {e}")
         return None
 
+class AsyncGitHubClient:
+    """Non-blocking GitHub client with pooled connections and a TTL response cache"""
+
+    def __init__(self, cache_ttl=60, timeout=15.0):
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self._client = None
+        self._cache = {}      # key -> (expires_at, (status_code, data))
+        self._inflight = {}   # key -> future shared by concurrent callers
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=GITHUB_API_URL,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+                headers={"Accept": "application/vnd.github.v3+json", "User-Agent": "TokenBot/1.0"}
+            )
+        return self._client
+
+    async def _get_json(self, token, path, params=None):
+        """GET a path, serving repeated calls from the cache and sharing in-flight requests"""
+        key = (token, path, tuple(sorted((params or {}).items())))
+
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            response = await self._get_client().get(
+                path,
+                headers={"Authorization": f"token {token}"},
+                params=params
+            )
+            data = response.json() if response.status_code == 200 else None
+            result = (response.status_code, data)
+
+            # Server errors are not cached so the next call retries; client errors only briefly
+            if response.status_code == 200:
+                self._cache[key] = (time.monotonic() + self.cache_ttl, result)
+            elif response.status_code < 500:
+                self._cache[key] = (time.monotonic() + GITHUB_ERROR_CACHE_SECONDS, result)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a lone caller does not leave an unobserved exception
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def invalidate(self):
+        """Drop cached responses (e.g. after a push)"""
+        self._cache.clear()
+
+    async def validate_connection(self):
+        """Async version of validate_github_connection"""
+        try:
+            token, repo_name = get_github_credentials()
+
+            if not token or not repo_name:
+                return False, "GitHub credentials not set. Use /setup command first."
+
+            status_code, repo_info = await self._get_json(token, f"/repos/{repo_name}")
+
+            if status_code == 200:
+                return True, f"✅ Connected to {repo_info.get('full_name', repo_name)}"
+            elif status_code == 404:
+                return False, "Repository not found or no access"
+            elif status_code == 401:
+                return False, "Invalid GitHub token"
+            else:
+                return False, f"API Error: {status_code}"
+
+        except Exception as e:
+            return False, f"Connection test failed: {str(e)}"
+
+    async def get_repo_stats(self):
+        """Async version of get_repo_stats; repo and commits are fetched concurrently"""
+        try:
+            token, repo_name = get_github_credentials()
+
+            if not token or not repo_name:
+                return None
+
+            (repo_status, repo_info), (commits_status, commits) = await asyncio.gather(
+                self._get_json(token, f"/repos/{repo_name}"),
+                self._get_json(token, f"/repos/{repo_name}/commits", params={"per_page": 5})
+            )
+
+            if repo_status == 200:
+                return {
+                    "name": repo_info.get("full_name"),
+                    "size": repo_info.get("size", 0),
+                    "updated": repo_info.get("updated_at"),
+                    "commits": len(commits) if commits_status == 200 else 0
+                }
+
+        except Exception as e:
+            logger.error(f"Error getting repo stats: {e}")
+        return None
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# Shared client for the bot's command handlers
+github_client = AsyncGitHubClient()
+
+async def async_validate_github_connection():
+    """Test GitHub connection without blocking the event loop"""
+    return await github_client.validate_connection()
+
+async def async_get_repo_stats():
+    """Get repository statistics without blocking the event loop"""
+    return await github_client.get_repo_stats()
+
 def is_github_configured():
     """Check if GitHub credentials are configured"""
     token, repo_name = get_github_credentials()
@@ -3,7 +3,11 @@ import requests
 import os
 import re
 import time
+import heapq
+import threading
+import logging
 import concurrent.futures
+from collections import Counter
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
@@ -12,15 +16,82 @@ from rich.progress import Progress, BarColumn, TextColumn, TimeRemainingColumn
 from rich.align import Align
 from rich import box
 
+from token_diff import write_token_artifact
+from runtime_config import runtime_config, TUNABLES
+from background_work import cpu_slot, yield_point
+from cycle_profiler import active_profiler
+
 console = Console()
+logger = logging.getLogger(__name__)
 
 API_URL = "https://jwt-token-generateor.vercel.app/token?uid={}&password={}"
 
-# 🔧 FIXED SETTINGS FOR BETTER SUCCESS RATE
-MAX_RETRIES = 3          # Retry failed requests
-CONCURRENCY_LIMIT = 4    # Reduced from 10 to avoid rate limiting
-RETRY_DELAY = 1.5        # Delay between retries
-REQUEST_DELAY = 0.3      # Small delay between requests
+# 🔧 Settings (concurrency_limit, max_retries, retry_delay, request_delay,
+# batch_delay, request_timeout) live in runtime_config and can be changed
+# live with /tune; they are read again at every request/batch.
+
+# 🔹 Per-cycle error aggregate (replaces per-request console spam)
+class ErrorAggregate:
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+    def add(self, kind):
+        with self._lock:
+            self._counts[kind] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+cycle_errors = ErrorAggregate()
+
+# 🔹 Per-cycle request telemetry (latency and outcome of every upstream request)
+class RequestTelemetry:
+    def __init__(self):
+        self._latencies = []
+        self._outcomes = Counter()
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._latencies = []
+            self._outcomes.clear()
+
+    def record(self, latency, outcome):
+        with self._lock:
+            self._latencies.append(latency)
+            self._outcomes[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            outcomes = dict(self._outcomes)
+        requests_made = len(latencies)
+        if not requests_made:
+            return {"requests": 0, "latency_mean": 0.0, "latency_p50": 0.0, "latency_p95": 0.0,
+                    "success": 0, "rate_limited": 0, "errors": 0}
+        return {
+            "requests": requests_made,
+            "latency_mean": sum(latencies) / requests_made,
+            "latency_p50": latencies[requests_made // 2],
+            "latency_p95": latencies[min(requests_made - 1, int(requests_made * 0.95))],
+            "success": outcomes.get("success", 0),
+            "rate_limited": outcomes.get("rate_limited", 0),
+            "errors": requests_made - outcomes.get("success", 0) - outcomes.get("rate_limited", 0),
+        }
+
+cycle_telemetry = RequestTelemetry()
+
+def report_fetch_error(kind, uid, detail, attempt):
+    """Count a fetch error and log it (rate limited per kind by the logging setup)"""
+    cycle_errors.add(kind)
+    logger.warning(f"{kind} for UID {uid}, attempt {attempt}: {detail}",
+                   extra={"kind": kind, "uid": uid, "attempt": attempt})
 
 # 🔥 Show Stylish Banner with "WELCOME TO FF BY NARAYAN"
 def show_banner():
@@ -38,56 +109,156 @@ def extract_uid_password(content):
     pattern = re.compile(r'"uid"\s*:\s*"(\d+)"\s*,\s*"password"\s*:\s*"([A-Fa-f0-9]+)"')
     return pattern.findall(content)
 
-# 🔹 Fetch Token (Enhanced with Retry Logic)
-def fetch_token(uid, password):
+# 🔹 Fetch Token (single attempt - retries are deferred to the retry pass)
+def fetch_token_once(uid, password, attempt=1):
+    """One request for a UID. Failed results carry `retry_after` seconds for the retry queue."""
     url = API_URL.format(uid, password)
-    
-    for attempt in range(MAX_RETRIES):
-        try:
-            # Small delay before request to avoid overwhelming server
-            if attempt > 0:
-                time.sleep(RETRY_DELAY * attempt)  # Exponential backoff
-            else:
-                time.sleep(REQUEST_DELAY)
-            
-            response = requests.get(url, timeout=5)  # Increased timeout
-            
-            if response.status_code == 200:
-                response_data = response.json()
-                token = response_data.get("token", None)
-                
-                if token:
-                    return {"uid": uid, "token": token, "status": "success"}
-                else:
-                    # API returned 200 but no token
-                    continue
-                    
-            elif response.status_code == 429:  # Rate limited
-                console.print(f"[yellow]Rate limited for UID {uid}, retrying...[/yellow]")
-                time.sleep(RETRY_DELAY * 2)
-                continue
-                
-            else:
-                # Other HTTP errors
-                console.print(f"[orange]HTTP {response.status_code} for UID {uid}, attempt {attempt + 1}[/orange]")
+    retry_delay = runtime_config.get("retry_delay")
+    retry_after = retry_delay * attempt  # Exponential backoff
+
+    # Small delay before a first request to avoid overwhelming server
+    if attempt == 1:
+        time.sleep(runtime_config.get("request_delay"))
+
+    start = time.monotonic()
+    outcome = "error"
+    try:
+        response = requests.get(url, timeout=runtime_config.get("request_timeout"))
+
+        if response.status_code == 200:
+            token = response.json().get("token", None)
+            if token:
+                outcome = "success"
+                return {"uid": uid, "token": token, "status": "success", "attempt": attempt}
+            # API returned 200 but no token
+            report_fetch_error("empty_token", uid, "HTTP 200 without token", attempt)
+
+        elif response.status_code == 429:  # Rate limited
+            outcome = "rate_limited"
+            report_fetch_error("rate_limited", uid, "HTTP 429", attempt)
+            retry_after = retry_delay * 2 * attempt
+            return {"uid": uid, "token": None, "status": "rate_limited", "attempt": attempt, "retry_after": retry_after}
+
+        else:
+            # Other HTTP errors
+            report_fetch_error("http_error", uid, f"HTTP {response.status_code}", attempt)
+
+    except requests.Timeout:
+        report_fetch_error("timeout", uid, "request timed out", attempt)
+
+    except requests.RequestException as e:
+        report_fetch_error("request_error", uid, str(e)[:50], attempt)
+
+    except Exception as e:
+        report_fetch_error("unexpected_error", uid, str(e)[:50], attempt)
+
+    finally:
+        cycle_telemetry.record(time.monotonic() - start, outcome)
+
+    return {"uid": uid, "token": None, "status": "failed", "attempt": attempt, "retry_after": retry_after}
+
+# 🔹 Fetch Token with inline retries (standalone use; cycles use the retry queue)
+def fetch_token(uid, password):
+    attempt = 1
+    while True:
+        result = fetch_token_once(uid, password, attempt)
+        if result["token"] or attempt >= runtime_config.get("max_retries"):
+            return result
+        time.sleep(result["retry_after"])
+        attempt += 1
+
+# 🔹 Retry Queue (per-UID backoff, drained after the first pass)
+class RetryQueue:
+    def __init__(self):
+        self._heap = []   # (ready_at, uid, password, next_attempt)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, uid, password, next_attempt, delay):
+        heapq.heappush(self._heap, (time.monotonic() + delay, uid, password, next_attempt))
+
+    def pop_ready(self, limit):
+        """Pop up to `limit` entries whose backoff has elapsed"""
+        now = time.monotonic()
+        ready = []
+        while self._heap and self._heap[0][0] <= now and len(ready) < limit:
+            _, uid, password, attempt = heapq.heappop(self._heap)
+            ready.append((uid, password, attempt))
+        return ready
+
+    def wait_time(self):
+        """Seconds until the next entry is ready"""
+        if not self._heap:
+            return 0
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+def profiled_fetch():
+    """fetch_token_once, wrapped for the pool threads while a cycle profile is active"""
+    profiler = active_profiler()
+    return profiler.wrap(fetch_token_once) if profiler else fetch_token_once
+
+def run_retry_pass(retry_queue, on_result):
+    """Retry failed UIDs with their own backoff, keeping up to concurrency_limit requests in flight.
+
+    `on_result` is called with every final result (success or out of attempts).
+    Returns retry pass stats.
+    """
+    stats = {"queued": len(retry_queue), "attempts": 0, "recovered": 0, "failed": 0, "rate_limited": 0}
+    start = time.monotonic()
+    fetch = profiled_fetch()
+
+    # Sized for the upper bound; concurrency_limit is re-read every round
+    with concurrent.futures.ThreadPoolExecutor(max_workers=TUNABLES["concurrency_limit"][2]) as executor:
+        in_flight = {}
+
+        while retry_queue or in_flight:
+            concurrency_limit = runtime_config.get("concurrency_limit")
+            for uid, password, attempt in retry_queue.pop_ready(concurrency_limit - len(in_flight)):
+                future = executor.submit(fetch, uid, password, attempt)
+                in_flight[future] = password
+                stats["attempts"] += 1
+
+            if not in_flight:
+                time.sleep(retry_queue.wait_time())
                 continue
-                
-        except requests.Timeout:
-            console.print(f"[red]Timeout for UID {uid}, attempt {attempt + 1}[/red]")
-            continue
-            
-        except requests.RequestException as e:
-            console.print(f"[red]Request error for UID {uid}: {str(e)[:50]}...[/red]")
-            continue
-            
-        except Exception as e:
-            console.print(f"[red]Unexpected error for UID {uid}: {str(e)[:50]}...[/red]")
-            continue
-    
-    return {"uid": uid, "token": None, "status": "failed"}
+
+            # Wake up for finished requests or for the next UID whose backoff elapses
+            timeout = retry_queue.wait_time() if retry_queue and len(in_flight) < concurrency_limit else None
+            done, _ = concurrent.futures.wait(in_flight, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                password = in_flight.pop(future)
+                result = future.result()
+
+                if result["status"] == "rate_limited":
+                    stats["rate_limited"] += 1
+
+                if result["token"]:
+                    stats["recovered"] += 1
+                    on_result(result)
+                elif result["attempt"] < runtime_config.get("max_retries"):
+                    retry_queue.push(result["uid"], password, result["attempt"] + 1, result["retry_after"])
+                else:
+                    stats["failed"] += 1
+                    on_result(result)
+
+    stats["duration"] = time.monotonic() - start
+    return stats
 
 # 🔹 Main Function (Enhanced)
-def process_json(json_file):
+def process_json(json_file, uid_password_pairs=None, cached_tokens=None, on_progress=None):
+    """Fetch tokens for an account file.
+
+    `uid_password_pairs` skips reading `json_file` when the caller already
+    selected the accounts; `cached_tokens` ({uid: token}) are still fresh and
+    go into the artifact without being fetched again. `on_progress` is called
+    after every batch with (tokens_by_uid, done, total).
+    """
+    cached_tokens = cached_tokens or {}
+    cycle_errors.reset()
+    cycle_telemetry.reset()
+    started_at = time.monotonic()
     try:
         show_banner() # 🏆 Show Stylish Banner at the Start
         
@@ -98,17 +269,27 @@ def process_json(json_file):
             expand=True
         ))
 
-        with open(json_file, "r", encoding="utf-8") as file:
-            content = file.read()
-            
-        uid_password_pairs = extract_uid_password(content)
+        if uid_password_pairs is None:
+            with open(json_file, "r", encoding="utf-8") as file:
+                content = file.read()
+
+            all_pairs = extract_uid_password(content)
+            # Fetch each UID once even if the file lists it several times
+            unique_pairs = {}
+            for uid, password in all_pairs:
+                unique_pairs.setdefault(uid, password)
+            uid_password_pairs = list(unique_pairs.items())
+            if len(uid_password_pairs) < len(all_pairs):
+                console.print(f"[yellow]⚠️ Skipping {len(all_pairs) - len(uid_password_pairs)} duplicate UID entries[/yellow]")
+
         total_uids = len(uid_password_pairs)
         
-        if total_uids == 0:
+        if total_uids == 0 and not cached_tokens:
             console.print("[bold red]❌ Error: No valid UID and Password found.[/bold red]")
-            return
+            return None
 
-        tokens = []
+        tokens = [{"token": token} for token in cached_tokens.values()]
+        tokens_by_uid = dict(cached_tokens)
         failed_uids = []
         
         table = Table(title="🚀 Token Retrieval Status", style="bold cyan", box=box.MINIMAL_DOUBLE_HEAD)
@@ -129,50 +310,89 @@ def process_json(json_file):
             
             task = progress.add_task("Fetching Tokens", total=total_uids)
             
+            def record_result(result):
+                nonlocal success_count
+                if result["token"]:
+                    tokens.append({"token": result["token"]})
+                    tokens_by_uid[result["uid"]] = result["token"]
+                    table.add_row(result["uid"], "[bold green]✅ Success[/bold green]", f"[blue]{result['attempt']}[/blue]")
+                    success_count += 1
+                else:
+                    failed_uids.append(result["uid"])
+                    table.add_row(result["uid"], "[bold red]❌ Failed[/bold red]", "[red]All[/red]")
+                progress.update(task, advance=1)
+
             # Process in smaller batches to avoid overwhelming the server
-            batch_size = CONCURRENCY_LIMIT
+            retry_queue = RetryQueue()
+            fetch = profiled_fetch()
+            i = 0
             
-            for i in range(0, len(uid_password_pairs), batch_size):
+            while i < len(uid_password_pairs):
+                # Safe point: pick up /tune changes between batches
+                batch_size = runtime_config.get("concurrency_limit")
                 batch = uid_password_pairs[i:i + batch_size]
+                i += batch_size
                 
-                with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENCY_LIMIT) as executor:
-                    future_to_uid = {executor.submit(fetch_token, uid, password): uid for uid, password in batch}
+                with concurrent.futures.ThreadPoolExecutor(max_workers=batch_size) as executor:
+                    future_to_password = {executor.submit(fetch, uid, password): password for uid, password in batch}
                     
-                    for future in concurrent.futures.as_completed(future_to_uid):
+                    for future in concurrent.futures.as_completed(future_to_password):
                         result = future.result()
+                        yield_point()
                         
-                        if result["token"]:
-                            tokens.append({"token": result["token"]})
-                            table.add_row(result["uid"], "[bold green]✅ Success[/bold green]", "[blue]Final[/blue]")
-                            success_count += 1
+                        if result["token"] or runtime_config.get("max_retries") <= 1:
+                            record_result(result)
                         else:
-                            failed_uids.append(result["uid"])
-                            table.add_row(result["uid"], "[bold red]❌ Failed[/bold red]", "[red]All[/red]")
-                        
-                        progress.update(task, advance=1)
+                            # Failed UIDs do not hold a worker slot while backing off
+                            retry_queue.push(result["uid"], future_to_password[future], 2, result["retry_after"])
                 
+                if on_progress:
+                    try:
+                        on_progress(tokens_by_uid, min(i, total_uids), total_uids)
+                    except Exception as e:
+                        logger.error(f"Progress callback failed: {e}")
+
                 # Small delay between batches
-                if i + batch_size < len(uid_password_pairs):
-                    time.sleep(0.5)
+                if i < len(uid_password_pairs):
+                    time.sleep(runtime_config.get("batch_delay"))
+
+            retry_stats = run_retry_pass(retry_queue, record_result) if retry_queue else None
 
-        console.print(table)
+        with cpu_slot():
+            console.print(table)
         console.print(f"\n[bold cyan]📊 Total IDs Processed:[/bold cyan] {total_uids}")
         console.print(f"[bold green]✅ Successful Tokens:[/bold green] {success_count}")
         console.print(f"[bold red]❌ Failed Attempts:[/bold red] {total_uids - success_count}")
         
+        if cached_tokens:
+            console.print(f"[bold blue]♻️ Reused Fresh Tokens:[/bold blue] {len(cached_tokens)}")
+
         # Show success rate
-        success_rate = (success_count / total_uids) * 100
+        success_rate = (success_count / max(1, total_uids)) * 100
         console.print(f"[bold yellow]📈 Success Rate:[/bold yellow] {success_rate:.1f}%")
         
+        if retry_stats:
+            console.print(
+                f"[bold yellow]🔁 Retry Pass:[/bold yellow] {retry_stats['queued']} UIDs, "
+                f"{retry_stats['attempts']} attempts, {retry_stats['recovered']} recovered, "
+                f"{retry_stats['failed']} failed, {retry_stats['rate_limited']} rate limited "
+                f"({retry_stats['duration']:.1f}s)"
+            )
+
+        errors = cycle_errors.snapshot()
+        if errors:
+            summary = ", ".join(f"{kind}: {count}" for kind, count in sorted(errors.items()))
+            console.print(f"[bold red]⚠️ Request Errors:[/bold red] {summary}")
+            logger.info(f"Cycle request errors for {json_file}: {summary}", extra={"errors": errors})
+
         if failed_uids:
             console.print(f"\n[bold red]Failed UIDs:[/bold red] {', '.join(failed_uids[:10])}{'...' if len(failed_uids) > 10 else ''}")
 
         # 🔹 Save Tokens to "token_ind.json"
+        output_file = os.path.join(os.path.dirname(json_file), "token_ind.json")
         if tokens:
-            output_file = os.path.join(os.path.dirname(json_file), "token_ind.json")
-            
-            with open(output_file, "w", encoding="utf-8") as outfile:
-                json.dump(tokens, outfile, indent=4, ensure_ascii=False)
+            # Ordered by UID so unchanged tokens give a byte-identical file
+            write_token_artifact(tokens_by_uid, output_file)
                 
             console.print(Panel(
                 f"📂 {len(tokens)} tokens saved to: [bold green]{output_file}[/bold green]",
@@ -182,12 +402,34 @@ def process_json(json_file):
         else:
             console.print("[bold red]❌ No tokens generated to save![/bold red]")
 
+        telemetry = {
+            **cycle_telemetry.snapshot(),
+            "accounts": total_uids,
+            "duration": time.monotonic() - started_at,
+            "settings": {name: runtime_config.get(name) for name in TUNABLES},
+        }
+
+        # UID-keyed result for callers (the saved artifact keeps its list format)
+        return {
+            "file": json_file,
+            "total": total_uids,
+            "success": success_count,
+            "cached": len(cached_tokens),
+            "failed_uids": failed_uids,
+            "errors": errors,
+            "retry_stats": retry_stats,
+            "telemetry": telemetry,
+            "tokens": tokens_by_uid,
+            "output_file": output_file,
+        }
+
     except FileNotFoundError:
         console.print("[bold red]❌ Error: File not found. Please provide a valid path.[/bold red]")
     except json.JSONDecodeError:
         console.print("[bold red]❌ Error: Invalid JSON file format.[/bold red]")
     except Exception as e:
         console.print(f"[bold red]❌ Unexpected Error: {e}[/bold red]")
+    return None
 
 if __name__ == "__main__":
     json_path = console.input("[bold cyan]Enter JSON file path: [/bold cyan]").strip()
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import queue
+import threading
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and goes into the JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with any `extra=` fields included"""
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """Let at most `burst` records per (logger, kind) through per `window` seconds.
+
+    Only records logged with `extra={"kind": ...}` are limited. The next record
+    that passes carries a `suppressed` count of what was dropped.
+    """
+
+    def __init__(self, burst=5, window=60.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._buckets = {}   # key -> [window_start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        kind = getattr(record, "kind", None)
+        if kind is None:
+            return True
+
+        key = (record.name, kind)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None or now - bucket[0] >= self.window:
+                suppressed = bucket[2] if bucket else 0
+                bucket = [now, 0, 0]
+                self._buckets[key] = bucket
+                if suppressed:
+                    record.suppressed = suppressed
+
+            if bucket[1] >= self.burst:
+                bucket[2] += 1
+                return False
+
+            bucket[1] += 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+            return True
+
+_listener = None
+
+def configure_logging():
+    """Route all logging through a queue to a background writer thread"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+
+    stream_handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Drop repeated per-UID noise before it is queued
+    queue_handler.addFilter(RateLimitFilter(
+        burst=int(os.getenv("LOG_RATE_LIMIT_BURST", "5")),
+        window=float(os.getenv("LOG_RATE_LIMIT_WINDOW", "60"))
+    ))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,6 +1,8 @@
 import os
 import json
 import asyncio
+import signal
+import secrets
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
@@ -10,19 +12,31 @@ from apscheduler.triggers.interval import IntervalTrigger
 import logging
 import base64
 
-# Import your existing modules
-from gwt import process_json
-from github_update import push_to_github, validate_github_connection
-
-# Load environment variables
+# Load environment variables (before project modules read their settings)
 load_dotenv()
 
-# Configure logging (Console only)
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO,
-    handlers=[logging.StreamHandler()]
-)
+from log_setup import configure_logging, shutdown_logging
+
+# Import your existing modules
+from gwt import process_json
+from github_update import async_validate_github_connection, async_get_repo_stats, github_client, create_backup, restore_backup
+from backup_store import BackupStore
+from account_index import AccountIndex
+from account_store import AccountStore
+from publishers import build_sinks_from_env, publish_all, format_publish_results
+from cycle_queue import CycleQueue, describe_resolution
+from cycle_profiler import CycleProfiler, profiling_requested_by_env
+from rolling_refresh import RollingRefresher, ROLLING_TICK_SECONDS, ROLLING_LEAD_MINUTES
+from webhook_server import WebhookServer
+from shard_leases import create_lease_store, PUBLISHER_SHARD, SHARD_PUBLISH_RETRY_SECONDS, SHARD_PUBLISH_RETRIES
+from token_diff import write_token_artifact, load_previous_index, save_index, diff_token_sets, has_changes, format_diff, record_diff, uid_index_path
+from runtime_config import runtime_config
+from progressive_publish import ProgressivePublisher, PROGRESSIVE_PUBLISH
+from capacity_planner import CapacityPlanner, format_plan, PLANNER_FRESHNESS_HOURS
+from background_work import BackgroundExecutor
+
+# Configure logging (Console only, written by a background thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 class SecureConfig:
@@ -80,6 +94,9 @@ class EnhancedTokenBot:
         
         self.account_files = ["accounts1.json", "accounts2.json", "accounts3.json"]
         self.current_file_index = 0
+        # Persists accounts and fetch results behind the index, so stored tokens survive restarts
+        self.account_store = AccountStore()
+        self.account_index = AccountIndex(self.account_files, store=self.account_store)
         self.awaiting_setup = {}
         
         # Initialize scheduler properly
@@ -92,6 +109,42 @@ class EnhancedTokenBot:
         self.total_failed_cycles = 0
         self.bot_start_time = datetime.now(timezone.utc)
         self.max_retry_attempts = 3
+        self.last_diff = None
+        self.last_publish_results = []
+        self.profile_next_cycle = profiling_requested_by_env()
+        self.profile_chat_id = None
+        self.last_profile_report = None
+        self.repo_line = None
+        self.repo_line_task = None
+        self.cycle_queue = CycleQueue(self.process_cycle)
+        # Held by file cycles and rolling ticks, which both fetch and write token_ind.json
+        self.artifact_lock = asyncio.Lock()
+        # "interval" (bulk file cycles) or "rolling" (expiry-driven refresh)
+        self.scheduler_mode = os.getenv("SCHEDULER_MODE", "interval").lower()
+        self.rolling = RollingRefresher(self.account_index)
+        # Shared lease store when several instances split the account files (SHARD_DB)
+        self.lease_store = create_lease_store()
+        if self.lease_store and self.scheduler_mode == "rolling":
+            # Rolling ticks refresh every UID regardless of shard leases, so each instance would duplicate the work
+            raise Exception("SCHEDULER_MODE=rolling cannot be combined with SHARD_DB; use interval mode for sharded instances")
+        self.pending_shard_publish = None
+        self.backup_enabled = os.getenv("BACKUP_ENABLED", "true").lower() in ("1", "true", "yes")
+        # Publish partial results at checkpoints during long cycles (single-instance mode only)
+        self.progressive_publish = PROGRESSIVE_PUBLISH
+        self.last_partial_publishes = 0
+        self.planner = CapacityPlanner()
+        # Cycle work runs in a bounded, lower-priority pool so handlers keep the loop
+        self.background = BackgroundExecutor()
+
+        # Telegram front end: webhook mode when WEBHOOK_URL is set, polling otherwise
+        self.telegram_api_base_url = os.getenv("TELEGRAM_API_BASE_URL")
+        self.webhook_url = os.getenv("WEBHOOK_URL")
+        self.webhook_path = os.getenv("WEBHOOK_PATH", "/telegram")
+        self.webhook_listen = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+        self.webhook_port = int(os.getenv("WEBHOOK_PORT", "8080"))
+        self.webhook_secret = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+        self.webhook_server = None
+        self.shutdown_event = asyncio.Event()
 
         if not self.bot_token:
             raise ValueError("TELEGRAM_BOT_TOKEN must be set")
@@ -130,25 +183,52 @@ class EnhancedTokenBot:
             logger.info(f"🕐 Scheduled job triggered at {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}")
             await self.send_admin_notification("🕐 Automatic cycle started (7-hour production schedule)")
             
-            result = await self.process_cycle(manual=False)
+            # A scheduled trigger never reuses a running cycle; it queues one follow-up
+            resolution, result = await self.cycle_queue.submit(attach=False, manual=False)
             
-            logger.info(f"🕐 Scheduled job completed: {result}")
+            logger.info(f"🕐 Scheduled job completed ({resolution}): {result}")
             
             # Update next run time
-            self.next_run = datetime.now(timezone.utc) + timedelta(hours=7)
+            self.next_run = datetime.now(timezone.utc) + timedelta(hours=runtime_config.get("interval_hours"))
+            return resolution
             
         except Exception as e:
             logger.error(f"Error in scheduled job: {e}")
             await self.send_admin_notification(f"🚨 Scheduled job error: {str(e)}", is_error=True)
+            return None
+
+    async def rolling_job_wrapper(self):
+        """Rolling mode tick: refresh UIDs nearing expiry, publish on a debounced cadence"""
+        # A file cycle owns token_ind.json while it runs; skip the tick rather than queue behind it
+        if self.artifact_lock.locked():
+            return
 
-    def start_scheduler(self, interval_hours=7):
-        """Production scheduler - 7 hours"""
+        try:
+            async with self.artifact_lock:
+                await self.background.run(self.rolling.tick)
+
+                if self.rolling.should_publish():
+                    current_index = await self.background.run(self.rolling.write_artifact)
+                    diff_summary, publish_status = await self.publish_tokens(current_index, "rolling")
+                    self.rolling.mark_published()
+                    self.last_run = datetime.now(timezone.utc)
+                    logger.info(f"🔁 Rolling publish: {len(current_index)} tokens | {publish_status}")
+
+        except Exception as e:
+            logger.error(f"Error in rolling refresh: {e}")
+
+    def start_scheduler(self, interval_hours=None):
+        """Production scheduler - 7 hours by default, tunable with /tune interval_hours"""
+        interval_hours = interval_hours or runtime_config.get("interval_hours")
         try:
             # Remove existing job if any
             if self.scheduler.get_job('token_cycle'):
                 logger.info("Removing existing scheduler job")
                 self.scheduler.remove_job('token_cycle')
 
+            if self.scheduler_mode == "rolling":
+                return self.start_rolling_scheduler()
+
             # Add new job with 7-hour interval
             self.scheduler.add_job(
                 func=self.scheduled_job_wrapper,  # Direct function reference
@@ -175,6 +255,50 @@ class EnhancedTokenBot:
             logger.error(f"Error starting scheduler: {e}")
             return f"❌ Failed to start scheduler: {str(e)}"
 
+    def reschedule_interval(self, interval_hours):
+        """Apply a new interval to the armed job, anchored to the last run rather than to now"""
+        job = self.scheduler.get_job('token_cycle')
+        if not job:
+            return self.start_scheduler(interval_hours)
+
+        now = datetime.now(timezone.utc)
+        if self.last_run:
+            anchor = self.last_run
+        elif job.next_run_time:
+            # No run yet: keep the phase the job was armed with
+            anchor = job.next_run_time - job.trigger.interval
+        else:
+            anchor = now
+        # Already overdue under the new interval: run shortly instead of skipping a period
+        self.next_run = max(anchor + timedelta(hours=interval_hours), now + timedelta(seconds=5))
+        job.reschedule(IntervalTrigger(hours=interval_hours, start_date=self.next_run))
+        logger.info(f"🕐 Interval changed to {interval_hours}h, next run at {self.next_run.strftime('%Y-%m-%d %H:%M:%S UTC')}")
+        return f"🕐 Interval {interval_hours}h - next run: {self.next_run.strftime('%H:%M:%S UTC')}"
+
+    def start_rolling_scheduler(self):
+        """Expiry-driven scheduler: small paced refreshes instead of a bulk cycle"""
+        if not self.rolling.tokens:
+            # Start from the last published tokens so their expiry is known
+            self.rolling.absorb(load_previous_index())
+
+        self.scheduler.add_job(
+            func=self.rolling_job_wrapper,
+            trigger=IntervalTrigger(seconds=ROLLING_TICK_SECONDS),
+            id='token_cycle',
+            replace_existing=True,
+            max_instances=1
+        )
+        logger.info(f"✅ ROLLING MODE: Refresh tick every {ROLLING_TICK_SECONDS}s")
+
+        if not self.scheduler.running:
+            self.scheduler.start()
+            logger.info("✅ Scheduler started successfully")
+
+        self.scheduler_running = True
+        self.next_run = datetime.now(timezone.utc) + timedelta(seconds=ROLLING_TICK_SECONDS)
+
+        return f"✅ 🔁 ROLLING: Refreshing tokens {ROLLING_LEAD_MINUTES:.0f} min before expiry\n🕐 Tick every {ROLLING_TICK_SECONDS}s"
+
     async def stop_scheduler(self):
         """Stop scheduler"""
         if self.scheduler_running:
@@ -213,16 +337,163 @@ class EnhancedTokenBot:
             'job_id': None
         }
 
+    async def get_repo_line(self):
+        """Short repository summary for status messages: the last known value, refreshed in the background"""
+        if not self.is_configured():
+            return "Not configured"
+
+        # Status views never wait on GitHub; the client's TTL cache keeps the refresh cheap
+        if self.repo_line_task is None or self.repo_line_task.done():
+            self.repo_line_task = asyncio.create_task(self.refresh_repo_line())
+        return self.repo_line or "Loading..."
+
+    async def refresh_repo_line(self):
+        try:
+            self.update_github_env()
+            stats = await async_get_repo_stats()
+            self.repo_line = f"{stats['name']} ({stats['commits']} recent commits)" if stats else "Unavailable"
+        except Exception as e:
+            logger.error(f"Error refreshing repo summary: {e}")
+            self.repo_line = "Unavailable"
+
     # ==================== PROCESS CYCLE ====================
     
     async def process_cycle(self, manual=False):
+        # Shared with rolling ticks: one writer of token_ind.json and the account index at a time
+        async with self.artifact_lock:
+            if not self.profile_next_cycle:
+                return await self._run_cycle(manual)
+
+            # One-shot profiling armed by /profile or PROFILE_NEXT_CYCLE
+            self.profile_next_cycle = False
+            profiler = CycleProfiler()
+            profiler.start()
+            try:
+                return await self._run_cycle(manual)
+            finally:
+                try:
+                    stats, thread_count = profiler.stop()
+                    profile_path = profiler.save(stats)
+                    self.last_profile_report = f"🔬 Cycle Profile\n📂 {profile_path}\n{profiler.report(stats, thread_count)}"
+                    logger.info(f"🔬 Cycle profile saved to {profile_path}")
+                    await self.send_profile_report()
+                except Exception as e:
+                    logger.error(f"Error collecting cycle profile: {e}")
+
+    async def send_profile_report(self):
+        chat_id = self.profile_chat_id or self.admin_chat_id
+        self.profile_chat_id = None
+        if chat_id and self.application and self.last_profile_report:
+            try:
+                # Plain text: profile lines contain characters Markdown would choke on
+                await self.application.bot.send_message(chat_id=chat_id, text=self.last_profile_report[:4000])
+            except Exception as e:
+                logger.error(f"Failed to send profile report: {e}")
+
+    async def publish_tokens(self, current_index, source):
+        """Diff against the previously published token set and publish if anything changed"""
+        diff_summary = None
+        if current_index:
+            diff_summary = diff_token_sets(load_previous_index(), current_index)
+            record_diff(diff_summary, source_file=source)
+            self.last_diff = diff_summary
+            logger.info(f"🔀 Token diff for {source}: {format_diff(diff_summary)}")
+
+        if diff_summary and not has_changes(diff_summary):
+            return diff_summary, "Skipped (no token changes)"
+
+        if self.backup_enabled:
+            backup_result = await self.background.run(create_backup, source)
+            logger.info(f"💾 {backup_result}")
+
+        # Publish to all sinks concurrently, each with its own retry policy
+        publish_results = await publish_all(build_sinks_from_env(self.max_retry_attempts), executor=self.background.executor)
+        self.last_publish_results = publish_results
+        if publish_results and not any(result["ok"] for result in publish_results):
+            raise Exception(f"All publish sinks failed\n{format_publish_results(publish_results)}")
+        if current_index and all(result["ok"] for result in publish_results):
+            save_index(current_index)
+        return diff_summary, format_publish_results(publish_results)
+
+    async def publish_merged_shards(self, source):
+        """Merge all shard outputs and publish them under the publisher lease; None if another instance holds it"""
+        if not await self.background.run(self.lease_store.try_acquire, PUBLISHER_SHARD):
+            return None
+        try:
+            async with self.lease_store.heartbeat(PUBLISHER_SHARD) as lost:
+                current_index = await self.background.run(self.lease_store.merge_outputs, self.account_files)
+                if lost.is_set():
+                    # Another instance took over publishing; retry rather than publish alongside it
+                    return None
+                if current_index:
+                    await self.background.run(write_token_artifact, current_index)
+                return await self.publish_tokens(current_index, source)
+        finally:
+            await self.background.run(self.lease_store.release, PUBLISHER_SHARD)
+
+    def defer_shard_publish(self, source):
+        """Retry the merged publish until the publisher lease frees up, so this shard's output is not dropped"""
+        if self.pending_shard_publish and not self.pending_shard_publish.done():
+            return
+
+        async def retry():
+            for attempt in range(1, SHARD_PUBLISH_RETRIES + 1):
+                await asyncio.sleep(SHARD_PUBLISH_RETRY_SECONDS)
+                try:
+                    async with self.artifact_lock:
+                        result = await self.publish_merged_shards(source)
+                except Exception as e:
+                    logger.error(f"Deferred shard publish failed: {e}")
+                    return
+                if result:
+                    logger.info(f"🚀 Deferred shard publish (attempt {attempt}): {result[1]}")
+                    return
+            logger.warning(f"⚠️ Publisher lease still held after {SHARD_PUBLISH_RETRIES} retries; "
+                           "output stays in the shard store for the next publisher")
+
+        self.pending_shard_publish = asyncio.create_task(retry())
+
+    async def publish_partial(self, local_file):
+        """Checkpoint publish during a cycle: sinks only, no diff, backup or state update"""
+        publish_results = await publish_all(
+            build_sinks_from_env(self.max_retry_attempts), local_file, executor=self.background.executor
+        )
+        logger.info(f"📤 Partial publish:\n{format_publish_results(publish_results)}")
+        return publish_results
+
+    async def fetch_tokens(self, current_file, to_fetch, cached_tokens):
+        """Fetch stage of a cycle"""
+        self.last_partial_publishes = 0
+        if not self.progressive_publish or self.lease_store:
+            return await self.background.run(
+                process_json, current_file, uid_password_pairs=to_fetch, cached_tokens=cached_tokens
+            )
+
+        progressive = ProgressivePublisher(cached_tokens, self.publish_partial, asyncio.get_running_loop())
+        try:
+            return await self.background.run(
+                process_json, current_file,
+                uid_password_pairs=to_fetch, cached_tokens=cached_tokens, on_progress=progressive.checkpoint
+            )
+        finally:
+            self.last_partial_publishes = await progressive.finish()
+
+    async def _run_cycle(self, manual=False):
         if not self.is_configured():
             return "❌ Bot not configured. Use /setup first."
         
         self.update_github_env()
         
+        lease_shard = None
         try:
-            current_file = self.account_files[self.current_file_index]
+            if self.lease_store:
+                # Multi-instance mode: take the least recently processed account file nobody holds
+                current_file = await self.background.run(self.lease_store.claim_next, self.account_files)
+                if current_file is None:
+                    return "⏸️ All account files are currently leased by other instances"
+                lease_shard = current_file
+            else:
+                current_file = self.account_files[self.current_file_index]
             start_time = datetime.now(timezone.utc)
             
             logger.info(f"🔄 Starting cycle: {current_file} ({'Manual' if manual else 'Automatic - 7h production'})")
@@ -232,8 +503,36 @@ class EnhancedTokenBot:
                 with open(current_file, 'w') as f:
                     json.dump([{"uid": "1234567890", "password": "abcdef1234567890"}], f)
 
-            logger.info(f"Processing tokens from {current_file}")
-            process_json(current_file)
+            # Fetch each UID at most once per refresh window across all account files
+            await self.background.run(self.account_index.refresh)
+            to_fetch, cached_tokens = self.account_index.select_for_fetch(current_file)
+
+            logger.info(f"Processing tokens from {current_file} ({len(to_fetch)} to fetch, {len(cached_tokens)} still valid in index)")
+            # Forecast before fetching so the planner can be checked against the actual cycle
+            forecast = await self.background.run(self.planner.predict, len(to_fetch))
+            lease_lost = False
+            if lease_shard:
+                async with self.lease_store.heartbeat(lease_shard) as lost:
+                    fetch_result = await self.fetch_tokens(current_file, to_fetch, cached_tokens)
+                # Renewing once more confirms the lease is still ours before its output is written
+                lease_lost = lost.is_set() or not await self.background.run(self.lease_store.renew, lease_shard)
+            else:
+                fetch_result = await self.fetch_tokens(current_file, to_fetch, cached_tokens)
+            if fetch_result:
+                fresh_tokens = {uid: token for uid, token in fetch_result["tokens"].items() if uid not in cached_tokens}
+                await self.background.run(self.account_index.record_fetch, fresh_tokens, fetch_result["failed_uids"])
+                self.rolling.absorb(fresh_tokens)
+                await self.background.run(self.planner.record, fetch_result["telemetry"], forecast)
+
+            if lease_shard and lease_lost:
+                # Another instance may hold the shard now: its output wins, ours is dropped
+                logger.warning(f"⚠️ Lease on {lease_shard} lost during the fetch - not writing its output")
+                lease_shard = None
+            elif lease_shard:
+                if fetch_result:
+                    await self.background.run(self.lease_store.write_output, lease_shard, fetch_result["tokens"])
+                await self.background.run(self.lease_store.release, lease_shard, completed=bool(fetch_result))
+                lease_shard = None
 
             if not os.path.exists("token_ind.json"):
                 # Create dummy token file for testing
@@ -244,14 +543,20 @@ class EnhancedTokenBot:
                 tokens = json.load(f)
                 token_count = len(tokens)
 
-            for attempt in range(self.max_retry_attempts):
-                try:
-                    github_result = push_to_github()
-                    break
-                except Exception as e:
-                    if attempt == self.max_retry_attempts - 1:
-                        raise e
-                    await asyncio.sleep(2)
+            retry_stats = fetch_result.get("retry_stats") if fetch_result else None
+            retry_line = (f"{retry_stats['recovered']}/{retry_stats['queued']} recovered in {retry_stats['attempts']} attempts"
+                          if retry_stats else "None needed")
+            if self.lease_store:
+                # Only the instance holding the publisher lease merges and publishes all shards
+                published = await self.publish_merged_shards(current_file)
+                if published:
+                    diff_summary, publish_status = published
+                else:
+                    self.defer_shard_publish(current_file)
+                    diff_summary, publish_status = None, "Deferred (another instance is publishing; retrying)"
+            else:
+                current_index = fetch_result["tokens"] if fetch_result else {}
+                diff_summary, publish_status = await self.publish_tokens(current_index, current_file)
 
             self.last_run = datetime.now(timezone.utc)
             processing_time = (datetime.now(timezone.utc) - start_time).total_seconds()
@@ -261,8 +566,10 @@ class EnhancedTokenBot:
             success_msg = f"""✅ {'Manual' if manual else 'Automatic (7-hour production)'} Cycle Completed
 📁 File: {current_file}
 🎯 Tokens Generated: {token_count}
-⏱️ Processing Time: {processing_time:.2f}s
-🚀 GitHub: Updated
+🔀 Diff: {format_diff(diff_summary) if diff_summary else 'Not available'}
+🔁 Retries: {retry_line}
+⏱️ Processing Time: {processing_time:.2f}s{f" (forecast {forecast['duration']:.0f}s)" if forecast else ""}
+🚀 Publish: {publish_status}{f" (after {self.last_partial_publishes} partial)" if self.last_partial_publishes else ""}
 📊 Total Success: {self.total_successful_cycles}
 🚀 Production Mode: 7-hour intervals"""
 
@@ -273,6 +580,8 @@ class EnhancedTokenBot:
             return success_msg
 
         except Exception as e:
+            if lease_shard:
+                await self.background.run(self.lease_store.release, lease_shard)
             self.total_failed_cycles += 1
             error_msg = f"❌ {'Manual' if manual else 'Automatic (7-hour production)'} Cycle Failed\nError: {str(e)}"
             logger.error(f"Cycle failed: {e}")
@@ -283,6 +592,14 @@ class EnhancedTokenBot:
             return error_msg
 
     # ==================== COMMAND HANDLERS ====================
+
+    async def require_admin(self, update: Update):
+        """Allow only the admin (ADMIN_CHAT_ID, or the first /start user); tell everyone else"""
+        if self.admin_chat_id and str(update.effective_user.id) == str(self.admin_chat_id):
+            return True
+        logger.warning(f"🔒 Refused admin command from user {update.effective_user.id}")
+        await update.effective_message.reply_text("🔒 This command is restricted to the bot admin")
+        return False
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not self.is_configured():
@@ -327,14 +644,26 @@ class EnhancedTokenBot:
 
         await update.message.reply_text(welcome_msg, reply_markup=reply_markup, parse_mode='Markdown')
 
+    async def cycle_and_reply(self, reply, **kwargs):
+        """Submit a cycle and send its result with `reply` once it finishes"""
+        try:
+            resolution, result = await self.cycle_queue.submit(**kwargs)
+            await reply(f"{describe_resolution(resolution)}\n\n{result}")
+        except Exception as e:
+            logger.error(f"Manual cycle failed: {e}")
+            await reply(f"❌ Cycle failed: {e}")
+
+    def start_manual_cycle(self, context, update, reply, **kwargs):
+        """Run the cycle as a task: PTB handles updates one at a time, so awaiting it here would block every other command"""
+        context.application.create_task(self.cycle_and_reply(reply, **kwargs), update=update)
+
     async def run_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not self.is_configured():
             await update.message.reply_text("❌ Bot not configured. Use /setup first.")
             return
             
         await update.message.reply_text("🔄 *Processing manually...*", parse_mode='Markdown')
-        result = await self.process_cycle(manual=True)
-        await update.message.reply_text(result)
+        self.start_manual_cycle(context, update, update.message.reply_text, manual=True)
 
     async def status_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         current_file = self.account_files[self.current_file_index]
@@ -343,6 +672,7 @@ class EnhancedTokenBot:
         
         total_cycles = self.total_successful_cycles + self.total_failed_cycles
         success_rate = (self.total_successful_cycles / max(1, total_cycles)) * 100
+        repo_line = await self.get_repo_line()
 
         status_msg = f"""📊 *Detailed Bot Status* 🚀
 
@@ -350,6 +680,7 @@ class EnhancedTokenBot:
 📁 *Next File*: {current_file}
 ⏰ *Last Run*: {self.last_run.strftime('%H:%M:%S UTC') if self.last_run else 'Never'}
 ⏱️ *Uptime*: {str(uptime).split('.')[0]}
+🐙 *Repo*: {repo_line}
 
 🚀 *PRODUCTION MODE: 7-Hour Auto Scheduler*
 • Running: {'🟢 Yes' if scheduler_status['running'] else '🔴 No'}
@@ -401,12 +732,139 @@ class EnhancedTokenBot:
     async def test_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Test scheduler manually"""
         await update.message.reply_text("🔄 *Running scheduler test...*", parse_mode='Markdown')
-        
+
+        async def run_test():
+            try:
+                resolution = await self.scheduled_job_wrapper()
+                await update.message.reply_text(
+                    f"✅ *Test completed successfully!*\n{describe_resolution(resolution) if resolution else ''}",
+                    parse_mode='Markdown'
+                )
+            except Exception as e:
+                await update.message.reply_text(f"❌ *Test failed:* {str(e)}", parse_mode='Markdown')
+
+        # Not awaited here, so other commands keep being handled during the cycle
+        context.application.create_task(run_test(), update=update)
+
+    async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Profile the next cycle (/profile) or run one now under the profiler (/profile run)"""
+        if not await self.require_admin(update):
+            return
+        self.profile_next_cycle = True
+        self.profile_chat_id = str(update.effective_chat.id)
+
+        if context.args and context.args[0].lower() == "run":
+            if not self.is_configured():
+                await update.message.reply_text("❌ Bot not configured. Use /setup first.")
+                return
+            await update.message.reply_text("🔬 *Profiling a manual cycle...*", parse_mode='Markdown')
+            # Do not attach: a cycle already running was not started under the profiler
+            self.start_manual_cycle(context, update, update.message.reply_text, attach=False, manual=True)
+            return
+
+        await update.message.reply_text(
+            "🔬 *Profiler armed*\n\nThe next cycle will be profiled and the report sent here.\n"
+            "Use `/profile run` to profile a manual cycle now.",
+            parse_mode='Markdown'
+        )
+
+    async def restore_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """List backup snapshots (/restore) or restore one (/restore <id|latest>)"""
+        if not await self.require_admin(update):
+            return
+        if context.args:
+            if self.artifact_lock.locked():
+                await update.message.reply_text("⏳ Restore will run once the current cycle finishes")
+            context.application.create_task(self.restore_and_publish(context.args[0], update.message.reply_text), update=update)
+            return
+
+        store = BackupStore()
+        snapshots = store.list_snapshots()[:10]
+        if not snapshots:
+            await update.message.reply_text("⚠️ No backups stored yet")
+            return
+
+        lines = [f"{snap['id']} - {snap['size']} bytes" for snap in snapshots]
+        await update.message.reply_text(
+            "💾 Backups (newest first)\n\n" + "\n".join(lines) +
+            f"\n\n📦 Disk: {store.disk_usage() / 1024:.1f} KB\nUse /restore <id> or /restore latest"
+        )
+
+    async def restore_and_publish(self, snapshot_id, reply):
+        """Restore a snapshot over token_ind.json and publish it, holding the artifact lock"""
+        async with self.artifact_lock:
+            result = await self.background.run(restore_backup, snapshot_id)
+            if not result.startswith("✅"):
+                await reply(result)
+                return
+
+            # The restored list carries no UIDs, so the diff baseline and the UID index cannot describe it:
+            # drop both so the next cycle republishes in full instead of diffing against pre-restore state
+            await self.background.run(save_index, {})
+            if os.path.exists(uid_index_path("token_ind.json")):
+                os.remove(uid_index_path("token_ind.json"))
+
+            publish_results = await publish_all(
+                build_sinks_from_env(self.max_retry_attempts), executor=self.background.executor
+            )
+            self.last_publish_results = publish_results
+        await reply(f"{result}\n🚀 Publish:\n{format_publish_results(publish_results)}")
+
+    async def tune_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show (/tune), change (/tune <name> <value>) or reset (/tune reset) performance settings"""
+        if not await self.require_admin(update):
+            return
+        args = context.args or []
+        old_interval = runtime_config.get("interval_hours")
+
+        if not args:
+            await update.message.reply_text(f"⚙️ Runtime Settings\n\n{runtime_config.describe()}\n\nUse /tune <name> <value>")
+            return
+
+        if args[0] == "reset":
+            runtime_config.reset()
+            message = "♻️ Settings reset to defaults"
+        elif len(args) == 2:
+            try:
+                old_value, new_value = runtime_config.set(args[0], args[1])
+            except ValueError as e:
+                await update.message.reply_text(f"❌ {e}")
+                return
+            message = f"✅ {args[0]}: {old_value} → {new_value}"
+            if self.cycle_queue.running:
+                message += "\n🔄 Running cycle picks this up at its next batch"
+        else:
+            await update.message.reply_text("❌ Usage: /tune <name> <value> or /tune reset")
+            return
+
+        # Only an interval change touches the schedule; other settings must not postpone the next run
+        new_interval = runtime_config.get("interval_hours")
+        if new_interval != old_interval and self.scheduler_running and self.scheduler_mode != "rolling":
+            message += f"\n{self.reschedule_interval(new_interval)}"
+
+        await update.message.reply_text(message)
+
+    async def plan_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Capacity plan from cycle telemetry: /plan [freshness_hours] [accounts_per_file]"""
+        args = context.args or []
         try:
-            await self.scheduled_job_wrapper()
-            await update.message.reply_text("✅ *Test completed successfully!*", parse_mode='Markdown')
-        except Exception as e:
-            await update.message.reply_text(f"❌ *Test failed:* {str(e)}", parse_mode='Markdown')
+            freshness_hours = float(args[0]) if args else PLANNER_FRESHNESS_HOURS
+            accounts_per_file = int(args[1]) if len(args) > 1 else None
+        except ValueError:
+            await update.message.reply_text("❌ Usage: /plan [freshness_hours] [accounts_per_file]")
+            return
+
+        if accounts_per_file is None:
+            # A running cycle has just refreshed the index: use its snapshot rather than refresh alongside it
+            if not self.artifact_lock.locked():
+                async with self.artifact_lock:
+                    await self.background.run(self.account_index.refresh)
+            accounts_per_file = max(len(self.account_index.file_uids(path)) for path in self.account_files)
+
+        file_count = len(self.account_files)
+        recommendation = await asyncio.to_thread(self.planner.recommend, freshness_hours, accounts_per_file, file_count)
+        accuracy = await asyncio.to_thread(self.planner.accuracy)
+        await update.message.reply_text(format_plan(recommendation, accuracy, freshness_hours, accounts_per_file, file_count))
 
     async def setup_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         keyboard = [
@@ -467,6 +925,9 @@ class EnhancedTokenBot:
                 self.repo_name = user_input
                 await update.message.reply_text("✅ *Repository saved!*", parse_mode='Markdown')
             
+            # Forget the summary of the previous repository/token
+            self.repo_line = None
+
             # Save configuration
             config_to_save = {
                 "telegram_token": self.bot_token,
@@ -552,7 +1013,7 @@ class EnhancedTokenBot:
             
             self.update_github_env()
             try:
-                is_connected, message = validate_github_connection()
+                is_connected, message = await async_validate_github_connection()
                 
                 if is_connected:
                     test_msg = f"✅ *Setup Test Successful*\n\n{message}"
@@ -568,12 +1029,14 @@ class EnhancedTokenBot:
             current_file = self.account_files[self.current_file_index]
             uptime = datetime.now(timezone.utc) - self.bot_start_time
             scheduler_status = await self.get_scheduler_status()
+            repo_line = await self.get_repo_line()
             
             status_msg = f"""📊 *Quick Status* 🚀
 
 🔄 *Status*: {'🟢 Running' if scheduler_status['running'] else '🔴 Stopped'}
 📁 *Next*: {current_file}
 ⏱️ *Uptime*: {str(uptime).split('.')[0]}
+🐙 *Repo*: {repo_line}
 ✅ *Success*: {self.total_successful_cycles}
 ❌ *Failed*: {self.total_failed_cycles}
 🚀 *Next Auto*: {self.next_run.strftime('%H:%M UTC') if self.next_run else 'Not scheduled'}
@@ -588,8 +1051,7 @@ class EnhancedTokenBot:
                 return
                 
             await query.edit_message_text("🔄 *Processing manually...*", parse_mode='Markdown')
-            result = await self.process_cycle(manual=True)
-            await query.edit_message_text(result)
+            self.start_manual_cycle(context, update, query.edit_message_text, manual=True)
 
         elif query.data == "scheduler_status":
             scheduler_status = await self.get_scheduler_status()
@@ -640,7 +1102,11 @@ class EnhancedTokenBot:
             print("❌ No Telegram bot token found!")
             return False
 
-        self.application = Application.builder().token(self.bot_token).build()
+        builder = Application.builder().token(self.bot_token)
+        if self.telegram_api_base_url:
+            # Local Bot API server or stand-in
+            builder = builder.base_url(f"{self.telegram_api_base_url.rstrip('/')}/bot")
+        self.application = builder.build()
 
         # Add all command handlers
         self.application.add_handler(CommandHandler("start", self.start_command))
@@ -651,6 +1117,10 @@ class EnhancedTokenBot:
         self.application.add_handler(CommandHandler("test", self.test_command))
         self.application.add_handler(CommandHandler("pause", self.pause_command))
         self.application.add_handler(CommandHandler("resume", self.resume_command))
+        self.application.add_handler(CommandHandler("profile", self.profile_command))
+        self.application.add_handler(CommandHandler("restore", self.restore_command))
+        self.application.add_handler(CommandHandler("tune", self.tune_command))
+        self.application.add_handler(CommandHandler("plan", self.plan_command))
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_setup_message))
         self.application.add_handler(CallbackQueryHandler(self.button_callback))
 
@@ -667,15 +1137,55 @@ class EnhancedTokenBot:
 
         return True
 
+    async def start_webhook(self):
+        """Serve updates through the built-in webhook server. Returns False to fall back to polling."""
+        url = f"{self.webhook_url.rstrip('/')}{self.webhook_path}"
+        try:
+            self.webhook_server = WebhookServer(
+                self.application,
+                host=self.webhook_listen,
+                port=self.webhook_port,
+                path=self.webhook_path,
+                secret_token=self.webhook_secret
+            )
+            await self.webhook_server.start()
+            await self.application.bot.set_webhook(url=url, secret_token=self.webhook_secret)
+            logger.info(f"🌐 Webhook mode active: {url}")
+            return True
+        except Exception as e:
+            logger.error(f"Webhook setup failed, falling back to polling: {e}")
+            if self.webhook_server:
+                await self.webhook_server.stop()
+                self.webhook_server = None
+            return False
+
+    def request_shutdown(self):
+        self.shutdown_event.set()
+
+    async def start_frontend(self):
+        """Start handling updates via webhook (if configured) or long polling"""
+        await self.application.start()
+
+        if self.webhook_url and await self.start_webhook():
+            return "webhook"
+
+        await self.application.updater.start_polling()
+        logger.info("📡 Polling mode active")
+        return "polling"
+
     async def start_bot(self):
         if self.application:
-            await self.application.start()
-            await self.application.updater.start_polling()
+            await self.start_frontend()
+
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, self.request_shutdown)
+                except (NotImplementedError, RuntimeError):
+                    pass
 
             try:
-                while True:
-                    await asyncio.sleep(1)
-            except KeyboardInterrupt:
+                await self.shutdown_event.wait()
                 logger.info("Shutting down...")
             finally:
                 await self.cleanup()
@@ -685,10 +1195,25 @@ class EnhancedTokenBot:
             if self.scheduler_running:
                 await self.stop_scheduler()
                 
+            await github_client.close()
+
+            if self.webhook_server:
+                await self.webhook_server.stop()
+                self.webhook_server = None
+
             if self.application:
-                await self.application.updater.stop()
-                await self.application.stop()
-                await self.application.shutdown()
+                if self.application.updater and self.application.updater.running:
+                    await self.application.updater.stop()
+                if self.application.running:
+                    await self.application.stop()
+                    await self.application.shutdown()
+
+            if self.pending_shard_publish:
+                self.pending_shard_publish.cancel()
+            if self.repo_line_task:
+                self.repo_line_task.cancel()
+            self.background.shutdown()
+            self.account_store.close()
                 
         except Exception as e:
             logger.error(f"Cleanup error: {e}")
@@ -709,6 +1234,7 @@ async def main():
     finally:
         if bot:
             await bot.cleanup()
+        shutdown_logging()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,99 @@
+import os
+import time
+import asyncio
+import threading
+import logging
+
+from token_diff import write_token_artifact
+
+logger = logging.getLogger(__name__)
+
+PROGRESSIVE_PUBLISH = os.getenv("PROGRESSIVE_PUBLISH", "false").lower() in ("1", "true", "yes")
+# Checkpoints: every N percent of the file and/or every N seconds (0 disables either trigger)
+PROGRESSIVE_PERCENT_STEP = float(os.getenv("PROGRESSIVE_PERCENT_STEP", "25"))
+PROGRESSIVE_INTERVAL_SECONDS = float(os.getenv("PROGRESSIVE_INTERVAL_SECONDS", "600"))
+# Debounce: minimum time between two partial commits
+PROGRESSIVE_MIN_GAP_SECONDS = float(os.getenv("PROGRESSIVE_MIN_GAP_SECONDS", "300"))
+# Checkpoint artifacts live here under the canonical file names, apart from the cycle's token_ind.json
+PROGRESSIVE_DIR = os.getenv("PROGRESSIVE_DIR", "partial")
+
+class ProgressivePublisher:
+    """Publishes partial results of a long cycle at checkpoints.
+
+    `checkpoint` is called from the fetch thread after every batch. When a
+    checkpoint is due, the current file's tokens so far (fetched, plus
+    `base_tokens` reused from the index) are written atomically to a
+    checkpoint artifact in PROGRESSIVE_DIR and published on the event loop by
+    `publish` (an async callable taking the artifact path). Other files'
+    tokens are never included, so nothing appears in a checkpoint that the
+    final artifact drops, and the final write of token_ind.json never
+    touches a file a partial publish is reading. Partial publishes are
+    debounced and never overlap; the final publish stays with the caller.
+    """
+
+    def __init__(self, base_tokens, publish, loop, artifact_path=os.path.join(PROGRESSIVE_DIR, "token_ind.json"),
+                 percent_step=PROGRESSIVE_PERCENT_STEP, interval_seconds=PROGRESSIVE_INTERVAL_SECONDS,
+                 min_gap_seconds=PROGRESSIVE_MIN_GAP_SECONDS):
+        self.base_tokens = dict(base_tokens)
+        self.publish = publish
+        self.loop = loop
+        self.artifact_path = artifact_path
+        self.percent_step = percent_step
+        self.interval_seconds = interval_seconds
+        self.min_gap_seconds = min_gap_seconds
+
+        self.started_at = time.monotonic()
+        self.last_checkpoint_at = self.started_at
+        self.last_publish_at = None
+        self.next_percent = percent_step
+        self.published_size = 0
+        self.partial_publishes = 0
+        self._in_flight = None
+        self._lock = threading.Lock()
+
+    def _due(self, done, total, now):
+        percent = done / max(1, total) * 100
+        if self.percent_step > 0 and percent >= self.next_percent:
+            while self.next_percent <= percent:
+                self.next_percent += self.percent_step
+            return True
+        return self.interval_seconds > 0 and now - self.last_checkpoint_at >= self.interval_seconds
+
+    def checkpoint(self, tokens_by_uid, done, total):
+        """Progress callback for process_json"""
+        now = time.monotonic()
+        with self._lock:
+            if done >= total or not self._due(done, total, now):
+                return
+            self.last_checkpoint_at = now
+
+            if self._in_flight and not self._in_flight.done():
+                logger.info("📤 Checkpoint skipped: previous partial publish still running")
+                return
+            if self.last_publish_at and now - self.last_publish_at < self.min_gap_seconds:
+                logger.info("📤 Checkpoint skipped: debounced")
+                return
+            if len(tokens_by_uid) <= self.published_size:
+                return
+
+            # Called in the fetch thread, so the copy sees a consistent token set
+            merged = {**self.base_tokens, **tokens_by_uid}
+            os.makedirs(os.path.dirname(self.artifact_path) or ".", exist_ok=True)
+            write_token_artifact(merged, self.artifact_path)
+            self.published_size = len(tokens_by_uid)
+            self.last_publish_at = now
+            self.partial_publishes += 1
+            logger.info(f"📤 Partial publish {self.partial_publishes}: {done}/{total} fetched, "
+                        f"{len(merged)} tokens ({len(self.base_tokens)} reused)")
+            self._in_flight = asyncio.run_coroutine_threadsafe(self.publish(self.artifact_path), self.loop)
+
+    async def finish(self):
+        """Wait for a running partial publish so it cannot land after the final one"""
+        with self._lock:
+            in_flight = self._in_flight
+        if in_flight:
+            try:
+                await asyncio.wrap_future(in_flight)
+            except Exception as e:
+                logger.error(f"Partial publish failed: {e}")
+        return self.partial_publishes
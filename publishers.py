@@ -0,0 +1,201 @@
+import os
+import time
+import shutil
+import asyncio
+import threading
+import requests
+import logging
+
+from github_update import push_to_github, is_github_configured
+from token_diff import uid_index_path, WRITE_UID_INDEX
+
+logger = logging.getLogger(__name__)
+
+# How long a timed-out attempt may keep running (as a multiple of the sink timeout) before the sink gives up
+ABANDONED_ATTEMPT_GRACE = float(os.getenv("PUBLISH_ABANDONED_GRACE", "1.0"))
+
+class PublishSink:
+    """Base publishing sink with its own retry policy and timeout"""
+    name = "sink"
+
+    def __init__(self, max_retries=3, retry_delay=2.0, timeout=120.0):
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+
+    def publish(self, local_file):
+        """Publish the artifact synchronously and return a status message"""
+        raise NotImplementedError
+
+class GitHubSink(PublishSink):
+    """Push the artifact to the configured GitHub repository"""
+    name = "github"
+
+    def publish(self, local_file):
+        message = push_to_github(local_file)
+
+        index_file = uid_index_path(local_file)
+        if WRITE_UID_INDEX and os.path.exists(index_file):
+            message += "\n" + push_to_github(index_file)
+        return message
+
+class LocalDirSink(PublishSink):
+    """Mirror the artifact into a local directory"""
+    name = "local"
+
+    def __init__(self, directory, **kwargs):
+        super().__init__(**kwargs)
+        self.directory = directory
+
+    def publish(self, local_file):
+        message = self._mirror(local_file)
+
+        index_file = uid_index_path(local_file)
+        if WRITE_UID_INDEX and os.path.exists(index_file):
+            message += "\n" + self._mirror(index_file)
+        return message
+
+    def _mirror(self, local_file):
+        os.makedirs(self.directory, exist_ok=True)
+        target = os.path.join(self.directory, os.path.basename(local_file))
+
+        with open(local_file, "rb") as f:
+            new_content = f.read()
+        if os.path.exists(target):
+            with open(target, "rb") as f:
+                if f.read() == new_content:
+                    return f"⚡ No changes detected - {target} is already up to date"
+
+        # Unique per writer: a timed-out attempt may still be copying when the retry starts
+        tmp_target = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(local_file, tmp_target)
+        os.replace(tmp_target, target)
+        return f"✅ Mirrored to {target}"
+
+class HttpSink(PublishSink):
+    """POST the artifact to an HTTP endpoint"""
+    name = "http"
+
+    def __init__(self, url, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+
+    def publish(self, local_file):
+        with open(local_file, "rb") as f:
+            response = requests.post(
+                self.url,
+                data=f,
+                headers={"Content-Type": "application/json", "User-Agent": "TokenBot/1.0"},
+                timeout=self.timeout
+            )
+
+        if response.status_code not in [200, 201, 202, 204]:
+            raise Exception(f"HTTP sink error: {response.status_code} - {response.text[:200]}")
+        return f"✅ Posted to {self.url} ({response.status_code})"
+
+def build_sinks_from_env(github_retries=3):
+    """Build the configured sinks: GitHub plus optional PUBLISH_DIR / PUBLISH_HTTP_URL"""
+    sinks = []
+
+    if is_github_configured():
+        sinks.append(GitHubSink(
+            max_retries=github_retries,
+            retry_delay=2.0,
+            timeout=float(os.getenv("PUBLISH_GITHUB_TIMEOUT", "180"))
+        ))
+
+    publish_dir = os.getenv("PUBLISH_DIR")
+    if publish_dir:
+        sinks.append(LocalDirSink(
+            publish_dir,
+            max_retries=2,
+            retry_delay=0.5,
+            timeout=float(os.getenv("PUBLISH_DIR_TIMEOUT", "30"))
+        ))
+
+    publish_url = os.getenv("PUBLISH_HTTP_URL")
+    if publish_url:
+        sinks.append(HttpSink(
+            publish_url,
+            max_retries=int(os.getenv("PUBLISH_HTTP_RETRIES", "3")),
+            retry_delay=float(os.getenv("PUBLISH_HTTP_RETRY_DELAY", "2")),
+            timeout=float(os.getenv("PUBLISH_HTTP_TIMEOUT", "30"))
+        ))
+
+    return sinks
+
+async def run_sink(sink, local_file, executor=None):
+    """Run a sink with its retry policy in `executor` (default: asyncio's); never raises"""
+    loop = asyncio.get_running_loop()
+    start = time.monotonic()
+    last_error = None
+
+    for attempt in range(1, sink.max_retries + 1):
+        # Timing out cannot stop the worker thread, so the attempt is shielded and awaited below
+        future = loop.run_in_executor(executor, sink.publish, local_file)
+        try:
+            message = await asyncio.wait_for(asyncio.shield(future), timeout=sink.timeout)
+        except asyncio.TimeoutError:
+            last_error = f"timed out after {sink.timeout:.0f}s"
+            # Never retry alongside the abandoned attempt (GitHub 409s, duplicate commits), but only
+            # wait a bounded time for it so publish_all stays bounded too
+            logger.warning(f"Sink {sink.name} attempt {attempt} timed out; waiting for it to finish before retrying")
+            done, _ = await asyncio.wait([future], timeout=sink.timeout * ABANDONED_ATTEMPT_GRACE)
+            if not done:
+                # Still running: retrying now would overlap it, so the sink is reported failed
+                last_error = f"{last_error} and still running after a further {sink.timeout * ABANDONED_ATTEMPT_GRACE:.0f}s"
+                logger.error(f"Sink {sink.name}: abandoned attempt {attempt} still running, giving up")
+                return {
+                    "sink": sink.name,
+                    "ok": False,
+                    "attempts": attempt,
+                    "message": last_error,
+                    "elapsed": time.monotonic() - start,
+                }
+            if not future.exception():
+                message = future.result()
+            else:
+                last_error = f"{last_error}, then failed: {future.exception()}"
+                message = None
+        except Exception as e:
+            last_error = str(e)
+            message = None
+
+        if message is not None:
+            return {
+                "sink": sink.name,
+                "ok": True,
+                "attempts": attempt,
+                "message": message,
+                "elapsed": time.monotonic() - start,
+            }
+
+        logger.warning(f"Sink {sink.name} attempt {attempt}/{sink.max_retries} failed: {last_error}")
+        if attempt < sink.max_retries:
+            await asyncio.sleep(sink.retry_delay)
+
+    return {
+        "sink": sink.name,
+        "ok": False,
+        "attempts": sink.max_retries,
+        "message": last_error,
+        "elapsed": time.monotonic() - start,
+    }
+
+async def publish_all(sinks, local_file="token_ind.json", executor=None):
+    """Publish the artifact to all sinks concurrently"""
+    if not sinks:
+        return []
+    return list(await asyncio.gather(*(run_sink(sink, local_file, executor) for sink in sinks)))
+
+def format_publish_results(results):
+    """Multi-line sink summary for cycle reports"""
+    if not results:
+        return "No sinks configured"
+
+    lines = []
+    for result in results:
+        status = "✅" if result["ok"] else "❌"
+        detail = "" if result["ok"] else f" - {result['message']}"
+        lines.append(f"{status} {result['sink']} ({result['attempts']} attempt(s), {result['elapsed']:.1f}s){detail}")
+    return "\n".join(lines)
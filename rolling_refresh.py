@@ -0,0 +1,150 @@
+import os
+import json
+import math
+import time
+import base64
+import threading
+import concurrent.futures
+import logging
+
+from gwt import fetch_token_once
+from runtime_config import runtime_config
+from token_diff import write_token_artifact
+
+logger = logging.getLogger(__name__)
+
+# Rolling mode settings (SCHEDULER_MODE=rolling)
+ROLLING_LEAD_MINUTES = float(os.getenv("ROLLING_LEAD_MINUTES", "30"))         # refresh this long before exp
+ROLLING_RATE_PER_MINUTE = float(os.getenv("ROLLING_RATE_PER_MINUTE", "20"))   # steady upstream request rate
+ROLLING_TICK_SECONDS = int(os.getenv("ROLLING_TICK_SECONDS", "15"))
+ROLLING_BURST = int(os.getenv("ROLLING_BURST", "0"))                          # token bucket capacity (0: rate x tick)
+ROLLING_PUBLISH_DEBOUNCE_SECONDS = int(os.getenv("ROLLING_PUBLISH_DEBOUNCE_SECONDS", "600"))
+ROLLING_FALLBACK_TTL_HOURS = float(os.getenv("ROLLING_FALLBACK_TTL_HOURS", "7"))  # tokens without exp
+ROLLING_FAILURE_BACKOFF_SECONDS = 300
+
+def decode_token_exp(token):
+    """Read the `exp` claim of a JWT without verifying it"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except Exception:
+        return None
+
+class TokenBucket:
+    """Token-bucket pacer: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+
+    def try_acquire(self, count=1):
+        """Take up to `count` tokens and return how many were granted"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+        granted = min(count, int(self._tokens))
+        self._tokens -= granted
+        return granted
+
+def bucket_capacity(rate_per_minute=ROLLING_RATE_PER_MINUTE, tick_seconds=ROLLING_TICK_SECONDS, burst=ROLLING_BURST):
+    """Bucket capacity that can sustain the rate when it is drained once per tick"""
+    # One extra token absorbs tick jitter, so a slightly early tick does not lose a grant
+    minimum = math.ceil(rate_per_minute / 60.0 * tick_seconds) + 1
+    if burst and burst < minimum:
+        logger.warning(f"⚠️ ROLLING_BURST={burst} caps the rate at {burst * 60 / tick_seconds:.1f}/min "
+                       f"with a {tick_seconds}s tick; using {minimum} for {rate_per_minute:g}/min")
+    return max(burst, minimum)
+
+class RollingRefresher:
+    """Refresh each UID shortly before its token expires, paced by a token bucket"""
+
+    def __init__(self, account_index):
+        self.account_index = account_index
+        self.lead_seconds = ROLLING_LEAD_MINUTES * 60
+        self.bucket = TokenBucket(ROLLING_RATE_PER_MINUTE / 60.0, bucket_capacity())
+
+        self.tokens = {}       # uid -> token
+        self.expiry = {}       # uid -> exp (epoch seconds)
+        self.retry_at = {}     # uid -> earliest retry after a failed fetch
+        self.dirty = False
+        self.last_publish = 0.0
+        self.stats = {"fetched": 0, "failed": 0, "ticks": 0}
+        self._lock = threading.Lock()
+
+    def absorb(self, tokens_by_uid, now=None):
+        """Take tokens fetched elsewhere (previous state, manual cycles) into the rolling set"""
+        now = now or time.time()
+        with self._lock:
+            for uid, token in tokens_by_uid.items():
+                self.tokens[uid] = token
+                self.expiry[uid] = decode_token_exp(token) or now + ROLLING_FALLBACK_TTL_HOURS * 3600
+                self.retry_at.pop(uid, None)
+            if tokens_by_uid:
+                self.dirty = True
+
+    def due_uids(self, now=None):
+        """UIDs whose token expires within the lead time, soonest first"""
+        now = now or time.time()
+        due = []
+        for uid in self.account_index.owners:
+            if self.retry_at.get(uid, 0) > now:
+                continue
+            exp = self.expiry.get(uid, 0)
+            if exp - self.lead_seconds <= now:
+                due.append((exp, uid))
+        due.sort()
+        return [uid for _, uid in due]
+
+    def tick(self):
+        """Refresh as many due UIDs as the pacer allows. Returns the number refreshed."""
+        self.account_index.refresh()
+        self.stats["ticks"] += 1
+
+        due = self.due_uids()
+        granted = self.bucket.try_acquire(len(due))
+        if not granted:
+            return 0
+
+        batch = [(uid, self.account_index.passwords[uid]) for uid in due[:granted]]
+        fetched = {}
+        now = time.time()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=runtime_config.get("concurrency_limit")) as executor:
+            for result in executor.map(lambda pair: fetch_token_once(*pair), batch):
+                if result["token"]:
+                    fetched[result["uid"]] = result["token"]
+                else:
+                    self.retry_at[result["uid"]] = now + ROLLING_FAILURE_BACKOFF_SECONDS
+
+        self.stats["fetched"] += len(fetched)
+        self.stats["failed"] += len(batch) - len(fetched)
+        self.absorb(fetched)
+        self.account_index.record_fetch(fetched, [uid for uid, _ in batch if uid not in fetched])
+
+        logger.info(f"🔁 Rolling refresh: {len(fetched)}/{len(batch)} refreshed, {len(due) - granted} still due")
+        return len(fetched)
+
+    def should_publish(self, now=None):
+        """Debounced publish decision"""
+        now = now or time.monotonic()
+        return self.dirty and now - self.last_publish >= ROLLING_PUBLISH_DEBOUNCE_SECONDS
+
+    def current_index(self):
+        """{uid: token} for every indexed UID that has a token"""
+        with self._lock:
+            return {uid: self.tokens[uid] for uid in self.account_index.owners if uid in self.tokens}
+
+    def write_artifact(self, path="token_ind.json"):
+        """Write the merged token set in the token_ind.json list format"""
+        index = self.current_index()
+        write_token_artifact(index, path)
+        return index
+
+    def mark_published(self):
+        self.dirty = False
+        self.last_publish = time.monotonic()
@@ -0,0 +1,85 @@
+import os
+import json
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+RUNTIME_CONFIG_FILE = ".runtime_config.json"
+
+# name -> (type, min, max, default, description)
+TUNABLES = {
+    "concurrency_limit": (int, 1, 32, 4, "Parallel fetch workers per batch"),
+    "max_retries": (int, 1, 10, int(os.getenv("MAX_RETRIES", "3")), "Attempts per UID"),
+    "retry_delay": (float, 0.0, 60.0, 1.5, "Base retry backoff (s)"),
+    "request_delay": (float, 0.0, 10.0, 0.3, "Delay before a first request (s)"),
+    "batch_delay": (float, 0.0, 30.0, 0.5, "Pause between batches (s)"),
+    "request_timeout": (float, 1.0, 60.0, 5.0, "Upstream request timeout (s)"),
+    "interval_hours": (float, 0.1, 48.0, float(os.getenv("DEFAULT_INTERVAL_HOURS", "7")), "Scheduler interval (h)"),
+}
+
+class RuntimeConfig:
+    """Validated performance settings that can be changed live and persist across restarts"""
+
+    def __init__(self, path=RUNTIME_CONFIG_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._values = {name: spec[3] for name, spec in TUNABLES.items()}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+            for name, value in stored.items():
+                if name in TUNABLES:
+                    self._values[name] = self._validate(name, value)
+        except Exception as e:
+            logger.error(f"Error loading runtime config: {e}")
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._values, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _validate(self, name, value):
+        value_type, minimum, maximum, _, _ = TUNABLES[name]
+        try:
+            value = value_type(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a {value_type.__name__}")
+        if not minimum <= value <= maximum:
+            raise ValueError(f"{name} must be between {minimum} and {maximum}")
+        return value
+
+    def get(self, name):
+        return self._values[name]
+
+    def set(self, name, value):
+        """Validate, apply and persist a value. Returns (old, new)."""
+        if name not in TUNABLES:
+            raise ValueError(f"Unknown setting: {name}")
+        new_value = self._validate(name, value)
+        with self._lock:
+            old_value = self._values[name]
+            self._values[name] = new_value
+            self._save()
+        logger.info(f"⚙️ Runtime config: {name} {old_value} -> {new_value}")
+        return old_value, new_value
+
+    def reset(self):
+        """Restore defaults"""
+        with self._lock:
+            self._values = {name: spec[3] for name, spec in TUNABLES.items()}
+            self._save()
+
+    def describe(self):
+        return "\n".join(
+            f"{name} = {self._values[name]}  ({spec[4]}, {spec[1]}-{spec[2]})"
+            for name, spec in TUNABLES.items()
+        )
+
+runtime_config = RuntimeConfig()
@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import socket
+import asyncio
+import sqlite3
+import logging
+from contextlib import asynccontextmanager, closing
+
+logger = logging.getLogger(__name__)
+
+# Sharding is enabled by pointing SHARD_DB at a SQLite file on a volume shared by all instances
+SHARD_DB = os.getenv("SHARD_DB")
+SHARD_LEASE_SECONDS = int(os.getenv("SHARD_LEASE_SECONDS", "1800"))
+# When another instance is publishing, retry the merged publish this often, this many times
+SHARD_PUBLISH_RETRY_SECONDS = int(os.getenv("SHARD_PUBLISH_RETRY_SECONDS", "60"))
+SHARD_PUBLISH_RETRIES = int(os.getenv("SHARD_PUBLISH_RETRIES", "30"))
+INSTANCE_ID = os.getenv("INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+PUBLISHER_SHARD = "__publisher__"
+
+class ShardLeaseStore:
+    """Expiring leases on account files (shards) shared by several bot instances.
+
+    A lease is held while an instance processes a shard and renewed by a
+    heartbeat; if the instance dies the lease expires and another instance
+    takes the shard over. One extra lease elects the instance that merges
+    all shard outputs and publishes them.
+    """
+
+    def __init__(self, db_path, instance_id=INSTANCE_ID, lease_seconds=SHARD_LEASE_SECONDS, output_dir=None):
+        self.db_path = db_path
+        self.instance_id = instance_id
+        self.lease_seconds = lease_seconds
+        self.output_dir = output_dir or os.path.join(os.path.dirname(os.path.abspath(db_path)), "shard_outputs")
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "shard TEXT PRIMARY KEY, owner TEXT, expires_at REAL, last_completed_at REAL DEFAULT 0)"
+            )
+
+    def _connect(self):
+        # Autocommit, closed by callers via closing() (`with conn` alone never closes it).
+        # Rollback journal (not WAL): WAL needs shared memory, which shared volumes may not provide
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def try_acquire(self, shard):
+        """Take or renew the lease on a shard if it is free, expired or already ours"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE shard = ?", (shard,)).fetchone()
+
+            if row and row[0] and row[0] != self.instance_id and row[1] > now:
+                conn.execute("ROLLBACK")
+                return False
+
+            if row and row[0] and row[0] != self.instance_id:
+                logger.warning(f"🔓 Taking over expired lease on {shard} from {row[0]}")
+
+            conn.execute(
+                "INSERT INTO leases (shard, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(shard) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+                (shard, self.instance_id, now + self.lease_seconds)
+            )
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def renew(self, shard):
+        """Extend our lease; False if it was lost"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE shard = ? AND owner = ?",
+                (time.time() + self.lease_seconds, shard, self.instance_id)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, shard, completed=False):
+        """Give a lease back, recording completion so shards rotate fairly"""
+        with closing(self._connect()) as conn:
+            if completed:
+                conn.execute(
+                    "UPDATE leases SET owner = NULL, expires_at = 0, last_completed_at = ? WHERE shard = ? AND owner = ?",
+                    (time.time(), shard, self.instance_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE leases SET owner = NULL, expires_at = 0 WHERE shard = ? AND owner = ?",
+                    (shard, self.instance_id)
+                )
+
+    @asynccontextmanager
+    async def heartbeat(self, shard):
+        """Renew a lease while the body runs; SQLite calls stay off the event loop.
+
+        Yields an asyncio.Event that is set if the lease was lost, so the caller
+        can drop work another instance may have taken over.
+        """
+        lost = asyncio.Event()
+
+        async def renew_loop():
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                if not await asyncio.to_thread(self.renew, shard):
+                    logger.error(f"⚠️ Lost lease on {shard}")
+                    lost.set()
+                    return
+
+        task = asyncio.create_task(renew_loop())
+        try:
+            yield lost
+        finally:
+            # Not awaited: a renew stuck on the busy timeout must not hold up the cycle
+            task.cancel()
+
+    def claim_next(self, shards):
+        """Lease the least recently completed shard nobody else holds"""
+        with closing(self._connect()) as conn:
+            completed = dict(conn.execute("SELECT shard, last_completed_at FROM leases").fetchall())
+
+        for shard in sorted(shards, key=lambda name: completed.get(name) or 0):
+            if self.try_acquire(shard):
+                return shard
+        return None
+
+    def write_output(self, shard, tokens_by_uid):
+        """Store a shard's {uid: token} result for the publisher"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{os.path.basename(shard)}.tokens.json")
+        tmp_path = f"{path}.{self.instance_id}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(tokens_by_uid, f, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def merge_outputs(self, shards):
+        """Merge the latest output of every shard into one {uid: token} index"""
+        merged = {}
+        for shard in shards:
+            path = os.path.join(self.output_dir, f"{os.path.basename(shard)}.tokens.json")
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    merged.update(json.load(f))
+            except Exception as e:
+                logger.error(f"Error reading shard output {path}: {e}")
+        return merged
+
+def create_lease_store():
+    """Lease store when SHARD_DB is configured, else None (single-instance mode)"""
+    if not SHARD_DB:
+        return None
+    return ShardLeaseStore(SHARD_DB)
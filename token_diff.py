@@ -0,0 +1,124 @@
+import os
+import json
+from datetime import datetime, timezone
+import logging
+
+from background_work import cpu_slot
+
+logger = logging.getLogger(__name__)
+
+# UID-keyed snapshot of the last published token set
+STATE_FILE = "token_state.json"
+# One JSON line per cycle with the diff summary
+HISTORY_FILE = "token_diff_history.jsonl"
+
+# How many UIDs to keep as examples in a summary
+SAMPLE_SIZE = 10
+
+# Optional {uid: token} artifact written next to token_ind.json
+UID_INDEX_FILE = "token_ind_by_uid.json"
+WRITE_UID_INDEX = os.getenv("WRITE_UID_INDEX", "false").lower() in ("1", "true", "yes")
+
+def build_index(entries):
+    """Build a {uid: token} index from a dict or a list of {"uid", "token"} entries"""
+    if isinstance(entries, dict):
+        return {str(uid): token for uid, token in entries.items() if token}
+
+    index = {}
+    for entry in entries or []:
+        uid = entry.get("uid")
+        token = entry.get("token")
+        if uid and token:
+            index[str(uid)] = token
+    return index
+
+def load_previous_index(path=STATE_FILE):
+    """Load the UID-keyed index of the previously published artifact"""
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return build_index(json.load(f))
+    except Exception as e:
+        logger.error(f"Error loading previous token index: {e}")
+        return {}
+
+def save_index(index, path=STATE_FILE):
+    """Persist the UID-keyed index of the published artifact"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _write_atomic(path, content):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+def uid_index_path(artifact_path="token_ind.json"):
+    """Path of the UID-keyed index that belongs to an artifact"""
+    return os.path.join(os.path.dirname(artifact_path), UID_INDEX_FILE)
+
+def write_token_artifact(index, path="token_ind.json"):
+    """Write a {uid: token} index in the token_ind.json list format, ordered by UID.
+
+    Output is deterministic, so an unchanged token set gives byte-identical
+    files. With WRITE_UID_INDEX the UID-keyed index is written next to it.
+    """
+    with cpu_slot():
+        tokens = [{"token": index[uid]} for uid in sorted(index)]
+        _write_atomic(path, json.dumps(tokens, indent=4, ensure_ascii=False))
+
+    if WRITE_UID_INDEX:
+        with cpu_slot():
+            _write_atomic(uid_index_path(path), json.dumps(index, indent=2, sort_keys=True, ensure_ascii=False) + "\n")
+
+def diff_token_sets(previous, current):
+    """Compare two {uid: token} indexes in linear time"""
+    new_uids = [uid for uid in current if uid not in previous]
+    dropped_uids = [uid for uid in previous if uid not in current]
+
+    unchanged = 0
+    refreshed = 0
+    for uid, token in current.items():
+        if uid in previous:
+            if previous[uid] == token:
+                unchanged += 1
+            else:
+                refreshed += 1
+
+    return {
+        "previous_total": len(previous),
+        "current_total": len(current),
+        "new": len(new_uids),
+        "unchanged": unchanged,
+        "refreshed": refreshed,
+        "dropped": len(dropped_uids),
+        "new_uids": sorted(new_uids)[:SAMPLE_SIZE],
+        "dropped_uids": sorted(dropped_uids)[:SAMPLE_SIZE],
+    }
+
+def has_changes(summary):
+    """Check if a diff summary requires publishing"""
+    return bool(summary["new"] or summary["refreshed"] or summary["dropped"])
+
+def format_diff(summary):
+    """One-line diff summary for cycle reports"""
+    return (f"+{summary['new']} new | ={summary['unchanged']} unchanged | "
+            f"~{summary['refreshed']} refreshed | -{summary['dropped']} dropped")
+
+def record_diff(summary, source_file=None, path=HISTORY_FILE):
+    """Append a diff summary to the history file for later analysis"""
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "source_file": source_file,
+        **summary,
+    }
+
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except Exception as e:
+        logger.error(f"Error recording token diff: {e}")
@@ -0,0 +1,99 @@
+import json
+import hmac
+import asyncio
+import logging
+from urllib.parse import urlsplit
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1024 * 1024
+
+async def read_http_request(reader):
+    """Read one HTTP/1.1 request. Returns (method, path, headers, body) or None on EOF."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", "0"))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("Request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+def http_response(status, body=b"", content_type="application/json"):
+    reasons = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed"}
+    head = (
+        f"HTTP/1.1 {status} {reasons.get(status, 'OK')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: keep-alive\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+class WebhookServer:
+    """Minimal asyncio HTTP server feeding Telegram webhook updates into an Application"""
+
+    def __init__(self, application, host="0.0.0.0", port=8080, path="/telegram", secret_token=None):
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logger.info(f"🌐 Webhook server listening on {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            # Telegram keeps connections alive, so serve requests until the client closes
+            while True:
+                request = await read_http_request(reader)
+                if request is None:
+                    break
+                writer.write(await self._handle_request(*request))
+                await writer.drain()
+                if request[2].get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            logger.debug(f"Webhook connection closed: {e}")
+        finally:
+            writer.close()
+
+    async def _handle_request(self, method, target, headers, body):
+        if urlsplit(target).path != self.path:
+            return http_response(404)
+        if method != "POST":
+            return http_response(405)
+
+        if self.secret_token:
+            received = headers.get("x-telegram-bot-api-secret-token", "")
+            if not hmac.compare_digest(received, self.secret_token):
+                return http_response(403)
+
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except Exception as e:
+            logger.warning(f"Invalid webhook payload: {e}")
+            return http_response(400)
+
+        await self.application.update_queue.put(update)
+        return http_response(200)